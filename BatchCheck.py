@@ -0,0 +1,157 @@
+from itertools import islice
+from typing import TYPE_CHECKING, Generator
+
+import numpy as np
+
+from Path import Path, iter_paths
+from Position import Coordinate, SegmentPos, SegmentDirection
+from Shape import Shape, Hexagon, Square, Star, Triangle, Colored, ColorType
+
+if TYPE_CHECKING:
+    from Board import Board
+
+type Key = tuple[int, int] | tuple[int, int, SegmentDirection]
+
+
+def key(pos: Coordinate | SegmentPos) -> Key:
+    if isinstance(pos, SegmentPos):
+        return pos.coordinate.x, pos.coordinate.y, pos.direction
+    return pos.x, pos.y
+
+
+class BatchCheck:
+    """
+    `Board.check` for many paths at once with NumPy. Paths are stacked into boolean occupancy arrays,
+    one row per path: `points` over `Board.point_positions` and `edges` over `Board.segment_positions`.
+    Hexagons and Triangles are reductions over those arrays, the regions of every path are labelled together
+    by label propagation over the grid adjacency, and Squares and Stars read per-region colour histograms.
+    Blocks, Jacks and shapes in places these rules do not cover are left to `Board.check`, on the paths
+    that pass everything else (on every path if the board has a Jack, since a Jack may excuse any failure).
+    """
+
+    def __init__(self, board: 'Board'):
+        self.board = board
+        # Keyed by plain values, since positions of different `CoordinateType`s do not compare equal
+        self.point_index: dict[Key, int] = {key(point): i for i, point in enumerate(board.point_positions())}
+        self.segment_index: dict[Key, int] = {key(segment): i for i, segment in enumerate(board.segment_positions())}
+        grids = board.grid_positions()
+        self.grid_index: dict[Key, int] = {key(grid): i for i, grid in enumerate(grids)}
+        # Neighbouring grids, with the segment between them; a path through that segment keeps them apart
+        adjacency = [(self.grid_index[key(grid)], self.grid_index[key(near)], self.segment_index[key(segment)])
+                     for grid in grids for near, segment in board.grid_nears(grid)
+                     if (near.x, near.y) > (grid.x, grid.y) and key(near) in self.grid_index]
+        self.adjacency = np.array(adjacency, dtype=np.intp).reshape(-1, 3)
+
+        self.point_hexagons: list[int | None] = []
+        self.segment_hexagons: list[int | None] = []
+        self.triangles: list[tuple[list[int], int]] = []
+        self.squares: dict[ColorType, list[int]] = {}
+        self.stars: list[tuple[int, ColorType]] = []
+        self.colored: dict[ColorType, list[int]] = {}  # Grids of every `Colored` shape, by colour
+        self.has_jack = board.has_jack()
+        self.rest = False  # Whether some shape is left to `Board.check`
+        for name in ('points', 'segments', 'grids'):
+            for pos, obj in getattr(board, name).items():
+                for shape in obj.shapes:
+                    if not self.add(name, pos, shape):
+                        self.rest = True
+
+    def add(self, name: str, pos: Coordinate | SegmentPos, shape: Shape) -> bool:
+        """Records `shape` for the vectorised checks; False if it is left to `Board.check`."""
+        if isinstance(shape, Hexagon) and name == 'points':
+            self.point_hexagons.append(self.point_index.get(key(pos)))
+        elif isinstance(shape, Hexagon) and name == 'segments':
+            self.segment_hexagons.append(self.segment_index.get(key(pos)))
+        elif name != 'grids' or key(pos) not in self.grid_index:
+            return False
+        elif isinstance(shape, Triangle):
+            self.triangles.append(([self.segment_index[key(side)] for side in pos.nears()], shape.count))
+        elif isinstance(shape, Square):
+            self.squares.setdefault(shape.color, []).append(self.grid_index[key(pos)])
+        elif isinstance(shape, Star):
+            self.stars.append((self.grid_index[key(pos)], shape.color))
+        else:
+            return False
+        if isinstance(shape, Colored):
+            self.colored.setdefault(shape.color, []).append(self.grid_index[key(pos)])
+        return True
+
+    def occupancy(self, paths: list[Path]) -> tuple[np.ndarray, np.ndarray]:
+        """The points and edges arrays of `paths`."""
+        points = np.zeros((len(paths), len(self.point_index)), dtype=bool)
+        edges = np.zeros((len(paths), len(self.segment_index)), dtype=bool)
+        for row, path in enumerate(paths):
+            points[row, [self.point_index[key(point)] for point in path.points]] = True
+            edges[row, [self.segment_index[key(segment)] for segment in path.segments]] = True
+        return points, edges
+
+    def labels(self, edges: np.ndarray) -> np.ndarray:
+        """
+        For each path, the region of every grid, as the smallest grid index in it: labels only ever go down
+        across open adjacencies, and jumping to the label of the label halves the remaining distance.
+        """
+        count = len(edges)
+        labels = np.tile(np.arange(len(self.grid_index), dtype=np.intp), (count, 1))
+        if len(self.adjacency) == 0:
+            return labels
+        first, second, segment = self.adjacency.T
+        is_open = ~edges[:, segment]
+        rows = np.arange(count)[:, None]
+        while True:
+            lowest = np.minimum(labels[:, first], labels[:, second])
+            lowest = np.where(is_open, lowest, labels.shape[1])
+            updated = labels.copy()
+            np.minimum.at(updated, (rows, first[None, :]), lowest)
+            np.minimum.at(updated, (rows, second[None, :]), lowest)
+            updated = np.take_along_axis(updated, updated, axis=1)
+            if np.array_equal(updated, labels):
+                return labels
+            labels = updated
+
+    def histogram(self, labels: np.ndarray, grids: list[int]) -> np.ndarray:
+        """For each path and region label, how many of `grids` are in that region."""
+        counts = np.zeros(labels.shape, dtype=np.intp)
+        rows = np.arange(len(labels))[:, None]
+        np.add.at(counts, (rows, labels[:, grids]), 1)
+        return counts
+
+    def check_arrays(self, points: np.ndarray, edges: np.ndarray) -> np.ndarray:
+        """Which paths satisfy every shape recorded by `add`; the shapes left to `Board.check` are not looked at."""
+        passed = np.ones(len(points), dtype=bool)
+        for index in self.point_hexagons:
+            passed &= points[:, index] if index is not None else False
+        for index in self.segment_hexagons:
+            passed &= edges[:, index] if index is not None else False
+        for sides, count in self.triangles:
+            passed &= edges[:, sides].sum(axis=1) == count
+        if len(self.squares) != 0 or len(self.stars) != 0:
+            labels = self.labels(edges)
+            if len(self.squares) != 0:
+                colors = sum((self.histogram(labels, grids) > 0).astype(np.intp) for grids in self.squares.values())
+                passed &= (colors <= 1).all(axis=1)
+            colored = {color: self.histogram(labels, grids) for color, grids in self.colored.items()}
+            rows = np.arange(len(points))
+            for grid, color in self.stars:
+                passed &= colored[color][rows, labels[:, grid]] == 2
+        return passed
+
+    def check(self, paths: list[Path]) -> np.ndarray:
+        """`Board.check` of each path, as a boolean mask."""
+        if self.has_jack:
+            return np.array([self.board.check(path) for path in paths], dtype=bool)
+        passed = self.check_arrays(*self.occupancy(paths))
+        if self.rest:
+            for row in np.flatnonzero(passed):
+                passed[row] = self.board.check(paths[row])
+        return passed
+
+
+def iter_paths_batched(board: 'Board', batch: int = 4096, *, bitboard: bool = False,
+                       prune: bool = True) -> Generator[Path, None, None]:
+    """`iter_paths`, with the complete paths of the search checked `batch` at a time by `BatchCheck`."""
+    checker = BatchCheck(board)
+    candidates = iter_paths(board, bitboard=bitboard, prune=prune, check=False)
+    while len(paths := list(islice(candidates, batch))) != 0:
+        for path, passed in zip(paths, checker.check(paths)):
+            if passed:
+                yield path
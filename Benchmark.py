@@ -0,0 +1,304 @@
+import gc
+import json
+import os
+import tracemalloc
+from argparse import ArgumentParser
+from collections.abc import Callable
+from dataclasses import dataclass, replace
+from random import Random
+from time import perf_counter
+
+from Board import Board
+from Generator import generate_part
+from Path import Path, find_paths
+from Position import Coordinate, SegmentPos, BoardPart
+from Shape import Hexagon, Square, Star, Triangle, Block, Jack, Colors
+from SolveCache import solve_cache
+from Tiling import cached_match
+
+# Stored by `--save` and not committed: its timings only compare with runs on the machine that stored them
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+VERSION = 2
+SIZES = range(2, 8)
+KINDS = ['hexagon', 'square', 'star', 'triangle', 'block', 'jack']
+# How often the quick workloads run per timing, so that each takes a good fraction of a second
+FIND_PATHS_ROUNDS = 2
+CHECK_ROUNDS = 10
+MATCH_ROUNDS = 5
+GENERATE_COUNT = 10
+
+
+@dataclass
+class Case:
+    name: str
+    board: Board
+    solution: Path
+
+
+def random_path(board: Board, rng: Random) -> Path:
+    """
+    A random self-avoiding path from start to end over connected segments, by a depth-first search that tries
+    the neighbours nearer the end point first, give or take some noise, so that it seldom walks into a dead end.
+    """
+    points: list[Coordinate] = [board.start_point]
+    visited: set[Coordinate] = {board.start_point}
+    choices: list[list[Coordinate]] = []
+    while points[-1] != board.end_point:
+        if len(choices) < len(points):
+            nears = [near for near in board.nears(points[-1]) if near not in visited
+                     and board.is_connected(SegmentPos.between(points[-1], near))]
+            nears.sort(key=lambda near: -(abs(near.x - board.end_point.x) + abs(near.y - board.end_point.y)
+                                          + 3 * rng.random()))
+            choices.append(nears)
+        if len(choices[-1]) == 0:
+            choices.pop()
+            visited.remove(points.pop())
+            continue
+        near = choices[-1].pop()
+        points.append(near)
+        visited.add(near)
+    return Path(points, board.end_point)
+
+
+def solution_regions(board: Board, solution: Path) -> list[BoardPart]:
+    regions = board.regions(solution).regions
+    return [region.part for region in regions]
+
+
+def split_off(part: BoardPart, rng: Random, *, negative: bool) -> tuple[BoardPart, BoardPart]:
+    """
+    `part.split` until it gives a negative piece and what is left to tile with it, or else two non-empty halves.
+    """
+    while True:
+        first, second = part.split(rng)
+        if first.negative == negative and len(first.grids) != 0 and len(second.grids) != 0:
+            return first, second
+
+
+def build_case(size: int, kind: str) -> Case:
+    """
+    A `size`x`size` board with shapes of `kind` that a fixed random path solves, and half or more of the segments
+    off that path disconnected so that the search stays bounded on large boards.
+    """
+    rng = Random(f'{size}:{kind}')
+    board = Board(size, size, Coordinate(0, 0), Coordinate(size, size))
+    solution = random_path(board, rng)
+    used = set(solution.segments)
+    for segment in board.segment_positions():
+        if segment not in used and rng.random() < 0.5 + 0.05 * max(size - 5, 0):
+            board.disconnect(segment)
+    colors = [Colors.Red, Colors.Blue, Colors.White, Colors.Black]
+    regions = solution_regions(board, solution)
+    if kind == 'hexagon':
+        for point in solution.points[1::3]:
+            board.add_point_shape(point.x, point.y, Hexagon())
+        board.add_segment_shape(solution.segments[len(solution.segments) // 2], Hexagon())
+    elif kind in ('square', 'jack'):
+        for region, color in zip(regions, colors * len(regions)):
+            for grid in sorted(region.grids, key=str)[::2]:
+                board.add_grid_shape(grid.x, grid.y, Square(color))
+        if kind == 'jack':
+            jack, wrong = sorted(max(regions, key=len).grids, key=str)[-2:]
+            board.add_grid_shape(jack.x, jack.y, Jack())
+            color = next(color for color in colors if color not in board.get_colors_in(wrong, solution))
+            board.add_grid_shape(wrong.x, wrong.y, Square(color))
+    elif kind == 'star':
+        for region, color in zip(regions, colors * len(regions)):
+            if len(region.grids) >= 2:
+                for grid in rng.sample(sorted(region.grids, key=str), 2):
+                    board.add_grid_shape(grid.x, grid.y, Star(color))
+    elif kind == 'triangle':
+        for grid in board.grid_positions()[::3]:
+            if (count := board.get_segment_count(grid, solution)) != 0:
+                board.add_grid_shape(grid.x, grid.y, Triangle(count))
+    elif kind == 'block':
+        # The largest region with a negative piece added on, cut into a rotatable and a fixed piece
+        region = max(regions, key=lambda part: (len(part), sorted(map(str, part.grids))))
+        negative, grown = split_off(region, rng, negative=True)
+        rotatable, fixed = split_off(grown, rng, negative=False)
+        fixed = replace(fixed, rotate=False)
+        grids = sorted(region.grids, key=str)
+        for piece in (rotatable, fixed, negative):
+            grid = rng.choice(grids)
+            board.add_grid_shape(grid.x, grid.y, Block(piece))
+    return Case(f'{size}x{size}-{kind}', board, solution)
+
+
+def corpus() -> list[Case]:
+    return [build_case(size, kind) for size in SIZES for kind in KINDS]
+
+
+def clear_caches() -> None:
+    solve_cache.clear()
+    cached_match.cache_clear()
+
+
+def bench_find_paths(cases: list[Case]) -> tuple[Callable[[], object], int]:
+    def run() -> object:
+        counts: dict[str, int] = {}
+        for _ in range(FIND_PATHS_ROUNDS):
+            counts = {case.name: len(find_paths(case.board, cache=None)) for case in cases}
+        return counts
+
+    return run, len(cases) * FIND_PATHS_ROUNDS
+
+
+def bench_check(cases: list[Case]) -> tuple[Callable[[], object], int]:
+    # The solution and a few other paths of each board, so that both passing and failing checks are timed
+    checks: list[tuple[Board, Path]] = []
+    for case in cases:
+        rng = Random(case.name)
+        checks.append((case.board, case.solution))
+        checks.extend((case.board, random_path(case.board, rng)) for _ in range(4))
+
+    def run() -> object:
+        return sum(board.check(path) for _ in range(CHECK_ROUNDS) for board, path in checks) // CHECK_ROUNDS
+
+    return run, len(checks) * CHECK_ROUNDS
+
+
+def bench_match(cases: list[Case]) -> tuple[Callable[[], object], int]:
+    # The Block regions of the corpus, and every small region of it against a random split of itself
+    matches: list[tuple[BoardPart, list[BoardPart]]] = []
+    for case in cases:
+        rng = Random(case.name)
+        for region in case.board.regions(case.solution).regions:
+            if len(region.blocks) != 0:
+                matches.append((region.part, region.blocks))
+            if len(region.part) <= 8:
+                pieces = [piece for piece in region.part.split(rng) if len(piece.grids) != 0]
+                matches.append((region.part, pieces))
+
+    def run() -> object:
+        matched = 0
+        for _ in range(MATCH_ROUNDS):
+            cached_match.cache_clear()  # Or every round after the first only reads the cache
+            matched = sum(part.match(blocks) for part, blocks in matches)
+        return matched
+
+    return run, len(matches) * MATCH_ROUNDS
+
+
+def bench_generate(cases: list[Case]) -> tuple[Callable[[], object], int]:
+    board = Board(3, 3, Coordinate(0, 0), Coordinate(3, 3))
+    solution = random_path(board, Random(0))
+
+    def run() -> object:
+        return [str(generated.fingerprint()) for generated in generate_part(board, solution, GENERATE_COUNT, seed=0)]
+
+    return run, GENERATE_COUNT
+
+
+BENCHMARKS: dict[str, Callable[[list[Case]], tuple[Callable[[], object], int]]] = {
+    'find_paths': bench_find_paths,
+    'check': bench_check,
+    'match': bench_match,
+    'generate_part': bench_generate,
+}
+
+
+def calibration() -> object:
+    """
+    A fixed workload of plain dict, set, tuple and sort operations, timed alongside the benchmarks so that they are
+    compared as multiples of it, which evens out a machine running faster or slower from one run to the next.
+    """
+    rng = Random(0)
+    seen: dict[tuple[int, int], int] = {}
+    visited: set[tuple[int, int]] = set()
+    for i in range(200_000):
+        key = (rng.randrange(64), rng.randrange(64))
+        seen[key] = seen.get(key, 0) + 1
+        if i % 7 == 0:
+            visited.symmetric_difference_update({key})
+    return sum(count for _, count in sorted(seen.items())[::5]) + len(visited)
+
+
+def measure(run: Callable[[], object], operations: int, repeat: int) -> dict:
+    """
+    Best time of `repeat` runs from cold caches, each after a run of the calibration workload, and the ratio of
+    the two best times; then one more run for the peak of traced memory.
+    """
+    best = calibrated = float('inf')
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()  # As `timeit` does, so that a collection does not land in one timing and not the other
+        try:
+            start = perf_counter()
+            calibration()
+            calibrated = min(calibrated, perf_counter() - start)
+            clear_caches()
+            start = perf_counter()
+            result = run()
+            best = min(best, perf_counter() - start)
+        finally:
+            gc.enable()
+    clear_caches()
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'seconds': best, 'calibration': calibrated, 'ratio': best / calibrated,
+            'per_second': operations / best if best != 0 else None, 'operations': operations,
+            'peak_kib': peak // 1024, 'result': result}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Descriptions of every benchmark that got slower than `tolerance` allows or gives a different result. Speed is
+    compared by the ratio to the calibration run of each side; the calibration does not track the solver closely
+    enough across machines, so the baseline must come from the same machine.
+    """
+    failures: list[str] = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]
+        if result['result'] != old['result']:
+            failures.append(f'{name}: result changed')
+        if result['ratio'] > old['ratio'] * (1 + tolerance):
+            failures.append(f'{name}: {result["ratio"]:.2f}x the calibration run against {old["ratio"]:.2f}x '
+                            f'in the baseline (+{result["ratio"] / old["ratio"] - 1:.0%})')
+    return failures
+
+
+def main() -> None:
+    parser = ArgumentParser(description='Times the solver and the generator on a fixed corpus of boards.',
+                            epilog='Run with --save first, on the machine to compare on, before the changes to '
+                                   'time; a baseline is only comparable on the machine that stored it.')
+    parser.add_argument('--baseline', default=BASELINE, help='the stored results to compare against')
+    parser.add_argument('--save', action='store_true', help='store these results as the baseline instead')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown, as a fraction')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', choices=list(BENCHMARKS), nargs='+', help='run only these benchmarks')
+    args = parser.parse_args()
+
+    cases = corpus()
+    results: dict[str, dict] = {}
+    for name in args.only or BENCHMARKS:
+        results[name] = measure(*BENCHMARKS[name](cases), args.repeat)
+        print(f'{name:>14}: {results[name]["seconds"]:8.3f}s  {results[name]["ratio"]:7.2f}x  '
+              f'{results[name]["per_second"]:10.1f}/s  {results[name]["peak_kib"]:8d} KiB peak')
+
+    if args.save:
+        with open(args.baseline, 'w') as file:
+            json.dump({'version': VERSION, 'benchmarks': results}, file, indent=2)
+        return
+    try:
+        with open(args.baseline) as file:
+            stored = json.load(file)
+    except FileNotFoundError:
+        print(f'No baseline at {args.baseline}; run with --save to store one')
+        return
+    if stored.get('version') != VERSION:
+        print(f'The baseline at {args.baseline} is of another version; run with --save to store a new one')
+        return
+    baseline = stored['benchmarks']
+    if failures := compare(results, baseline, args.tolerance):
+        print('REGRESSION', *failures, sep='\n  ')
+        raise SystemExit(1)
+    print('No regression against', args.baseline)
+
+
+if __name__ == '__main__':
+    main()
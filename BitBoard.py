@@ -0,0 +1,118 @@
+from typing import TYPE_CHECKING, Generator
+
+from Budget import Budget, within
+from Path import Path, PartialPath, Trail
+from Position import Coordinate
+from Shape import Hexagon
+from Stats import stats
+
+if TYPE_CHECKING:
+    from Board import Board
+
+
+class BitBoard:
+    """
+    Compact encoding of a board's point lattice used during path search.
+    Point (x, y) is bit `x * (height + 1) + y`; a path's visited set is an int of these bits,
+    and each point keeps the mask (and the ordered tuple) of neighbours reachable through a connected segment.
+    It only speeds up walking the lattice: shape pruning and checks cost the same as in the default engine, so it
+    pays off on boards with few shapes besides hexagons, and hardly at all on boards full of region shapes.
+    """
+
+    def __init__(self, board: 'Board'):
+        self.board = board
+        topology = board.topology()
+        self.stride: int = topology.stride
+        self.size: int = topology.size
+        self.coordinates: list[Coordinate] = topology.coordinates
+        self.neighbours: list[tuple[int, ...]] = [tuple(topology.row(index)) for index in range(self.size)]
+        self.neighbour_masks: list[int] = [sum(1 << near for near in nears) for nears in self.neighbours]
+        self.hexagon_mask: int = sum(1 << self.index(pos) for pos, point in board.points.items()
+                                     if board.in_board(pos)
+                                     if any(isinstance(shape, Hexagon) for shape in point.shapes))
+        self.has_jack: bool = board.has_jack()
+        # Shapes other than point Hexagons are pruned through `Board.may_pass`, which needs a real `Path`
+        self.has_other_shapes: bool = (any(not isinstance(shape, Hexagon)
+                                           for point in board.points.values() for shape in point.shapes)
+                                       or any(len(obj.shapes) != 0
+                                              for obj in list(board.segments.values()) + list(board.grids.values())))
+
+    def index(self, point: Coordinate) -> int | None:
+        if not self.board.in_board(point):
+            return None
+        return point.x * self.stride + point.y
+
+    def points_of(self, mask: int) -> set[Coordinate]:
+        points: set[Coordinate] = set()
+        while mask != 0:
+            low = mask & -mask
+            points.add(self.coordinates[low.bit_length() - 1])
+            mask ^= low
+        return points
+
+    def reachable(self, last: int, visited: int, goal: int) -> int:
+        """Mask version of `Board.reachable_points`."""
+        reachable, frontier = 0, 1 << last
+        while frontier != 0:
+            found = 0
+            while frontier != 0:
+                low = frontier & -frontier
+                found |= self.neighbour_masks[low.bit_length() - 1]
+                frontier ^= low
+            found &= ~visited & ~reachable
+            reachable |= found
+            frontier = found & ~(1 << goal)
+        return reachable
+
+    def may_complete(self, path: Path, trail: Trail, last: int, visited: int, goal: int) -> bool:
+        """Mask version of `Board.may_complete` for a path that has not reached the goal yet."""
+        reachable = self.reachable(last, visited, goal)
+        if not reachable >> goal & 1:
+            return False
+        if self.has_jack:
+            return True
+        if self.hexagon_mask & ~(visited | reachable) != 0:
+            return False
+        if self.has_other_shapes:
+            return self.board.may_pass(PartialPath(path, self.points_of(reachable), trail))
+        return True
+
+    def iter_paths(self, *, prune: bool = True, check: bool = True,
+                   budget: Budget | None = None) -> Generator[Path, None, None]:
+        """Depth-first search over an explicit stack, holding the neighbours still to try of each point on the way."""
+        start, goal = self.index(self.board.start_point), self.index(self.board.end_point)
+        if start is None or goal is None:
+            return
+        # The path to each point on the way, as parent-pointer `Path` nodes sharing their prefixes
+        paths: list[Path] = []
+        trail = Trail()  # The points and segments of `paths[-1]`, for the shapes pruned through `Board.may_pass`
+        visited = 0
+        pending: list[list[int]] = [[start]]  # Last first; the list below `paths[i]` is `pending[i + 1]`
+        while len(pending) != 0:
+            if len(pending[-1]) == 0:
+                pending.pop()
+                if len(paths) != 0:
+                    visited ^= 1 << self.index(paths[-1].head)
+                    trail.leave(paths.pop())
+                continue
+            last = pending[-1].pop()
+            if budget is not None and not budget.spend():
+                return
+            path = Path.node(paths[-1] if len(paths) != 0 else None, self.coordinates[last], self.board.end_point)
+            visited |= 1 << last
+            if last == goal:
+                stats.count('find_paths.paths_checked')
+                if not check or within(budget, self.board.check, path):
+                    yield path
+                visited ^= 1 << last
+                continue
+            stats.count('find_paths.nodes')
+            free: int = self.neighbour_masks[last] & ~visited
+            trail.enter(path)
+            if free == 0 or (prune and not within(budget, self.may_complete, path, trail, last, visited, goal)):
+                stats.count('find_paths.dead_ends')
+                visited ^= 1 << last
+                trail.leave(path)
+                continue
+            paths.append(path)
+            pending.append([near for near in reversed(self.neighbours[last]) if free >> near & 1])
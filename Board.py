@@ -1,44 +1,53 @@
-from copy import deepcopy
-from dataclasses import dataclass, field
-from typing import Self, Generator
+from collections.abc import Mapping, Set
+from dataclasses import dataclass, field, replace
+from functools import cache
+from types import MappingProxyType
+from typing import Self, Generator, Literal
 
-from DefaultedDict import DefaultedDict
+from Fingerprint import MASK, feature, position_key
 from Position import Coordinate, SegmentPos, Position, SegmentDirection, BoardPart, CoordinateType
-from Shape import Shape, Jack, ColorType, Colored
-from Path import Path
+from Shape import Shape, RegionShape, Jack, ColorType, Colored
+from Path import Path, PartialPath, Trail
+from Region import Regions
+from JackCheck import JackCheck
+from Stats import stats, check_shape
+from Topology import Topology
 
 
-@dataclass
+@dataclass(frozen=True)
 class BoardObject:
-    shapes: list[Shape] = field(default_factory=list)
+    """Immutable, so that boards can share it; the `with_` methods make edited copies."""
+    shapes: tuple[Shape, ...] = ()
 
     def __post_init__(self):
-        if self.shapes is None:
-            self.shapes = []
+        if not isinstance(self.shapes, tuple):
+            object.__setattr__(self, 'shapes', tuple(self.shapes or ()))
+
+    def check(self, board: 'Board', pos: Position, path: Path, regions: Regions) -> bool:
+        return all(shape.check(board, pos, path, regions) for shape in self.shapes)
 
-    def check(self, board: 'Board', pos: Position, path: Path) -> bool:
-        return all(shape.check(board, pos, path) for shape in self.shapes)
+    def with_shapes(self, shapes: tuple[Shape, ...]) -> Self:
+        stats.count('copies.objects')
+        return replace(self, shapes=shapes)
 
     def without_one_shape(self) -> Generator[Self, None, None]:
         for i in range(len(self.shapes)):
-            copied = deepcopy(self)
-            copied.shapes.remove(copied.shapes[i])
-            yield copied
-
-    def without_jack(self) -> Self:
-        copied = deepcopy(self)
-        copied.shapes.remove([shape for shape in copied.shapes if isinstance(shape, Jack)][0])
-        return copied
+            yield self.with_shapes(self.shapes[:i] + self.shapes[i + 1:])
 
     def is_default(self) -> bool:
         return len(self.shapes) == 0
 
+    def fingerprint(self, name: 'ContainerName', pos: Position) -> int:
+        """This object's share of `Board.fingerprint`; shares are added, so equal shapes do not cancel out."""
+        key = position_key(pos)
+        return sum(feature(name, key, shape.key()) for shape in self.shapes) & MASK
+
 
 class Point(BoardObject):
     """Its x ranges in [0, width], y ranges in [0, height], and the left-down grid is (0,0)."""
 
 
-@dataclass
+@dataclass(frozen=True)
 class Segment(BoardObject):
     """Represents a segment from `coordinate` to `coordinate` + `direction`."""
     connected: bool = field(default=True)
@@ -47,36 +56,77 @@ class Segment(BoardObject):
         return self.connected is True and super().is_default()
 
     def with_connected(self, connected: bool) -> Self:
-        self.connected = connected
-        return self
+        return replace(self, connected=connected)
+
+    def fingerprint(self, name: 'ContainerName', pos: Position) -> int:
+        disconnected = 0 if self.connected else feature(name, position_key(pos), 'disconnected')
+        return (super().fingerprint(name, pos) + disconnected) & MASK
 
 
 class Grid(BoardObject):
     """Its x ranges in [0, width), y ranges in [0, height), and the left-down grid is (0,0)."""
 
 
+@cache
+def grid_nears(x: int, y: int, type: str, width: int, height: int) -> tuple[tuple[Coordinate, SegmentPos], ...]:
+    """`Board.grid_nears`, by plain values: the same for every board of that size, and never edited."""
+    grid = Coordinate.of(x, y, CoordinateType(type))
+    return tuple((near, segment) for near, segment in [
+        (grid + SegmentDirection.X, SegmentPos.of(grid + SegmentDirection.X, SegmentDirection.Y)),
+        (grid - SegmentDirection.X, SegmentPos.of(grid, SegmentDirection.Y)),
+        (grid + SegmentDirection.Y, SegmentPos.of(grid + SegmentDirection.Y, SegmentDirection.X)),
+        (grid - SegmentDirection.Y, SegmentPos.of(grid, SegmentDirection.X)),
+    ] if 0 <= near.x < width and 0 <= near.y < height)
+
+
+type ContainerName = Literal['points', 'segments', 'grids']
+DEFAULTS: dict[ContainerName, BoardObject] = {'points': Point(), 'segments': Segment(), 'grids': Grid()}
+type ShapeRef = tuple[ContainerName, Position, int]  # A shape by its container, position and index in its list
+
+
 @dataclass
 class Board:
     width: int
     height: int
     start_point: Coordinate
     end_point: Coordinate
-    points: dict[Coordinate, Point] = field(default_factory=DefaultedDict(Coordinate, Point))
-    segments: dict[SegmentPos, Segment] = field(default_factory=DefaultedDict(SegmentPos, Segment))
-    grids: dict[Coordinate, Grid] = field(default_factory=DefaultedDict(Coordinate, Grid))
+    # Read through `points`, `segments` and `grids`, and edited only through `_set`, which keeps the caches below.
+    # Positions with a default object are not stored, so readers look them up with `.get(pos, default)`
+    _points: dict[Coordinate, Point] = field(default_factory=dict, init=False)
+    _segments: dict[SegmentPos, Segment] = field(default_factory=dict, init=False)
+    _grids: dict[Coordinate, Grid] = field(default_factory=dict, init=False)
+    _fingerprint: int | None = field(default=None, init=False, repr=False, compare=False)
+    _constraints: tuple[tuple[Position, Shape], ...] | None = field(default=None, init=False, repr=False, compare=False)
+    _has_jack: bool | None = field(default=None, init=False, repr=False, compare=False)
+    _topology: Topology | None = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def points(self) -> Mapping[Coordinate, Point]:
+        return MappingProxyType(self._points)
+
+    @property
+    def segments(self) -> Mapping[SegmentPos, Segment]:
+        return MappingProxyType(self._segments)
+
+    @property
+    def grids(self) -> Mapping[Coordinate, Grid]:
+        return MappingProxyType(self._grids)
+
+    def container(self, name: 'ContainerName') -> Mapping[Position, BoardObject]:
+        return MappingProxyType(getattr(self, '_' + name))
 
     def point_positions(self) -> list[Coordinate]:
-        return [Coordinate(x, y, type=CoordinateType.Point)
+        return [Coordinate.of(x, y, CoordinateType.Point)
                 for x in range(self.width + 1) for y in range(self.height + 1)]
 
     def segment_positions(self) -> list[SegmentPos]:
-        return ([SegmentPos(Coordinate(x, y, type=CoordinateType.Point), SegmentDirection.X)
+        return ([SegmentPos.of(Coordinate.of(x, y, CoordinateType.Point), SegmentDirection.X)
                  for x in range(self.width) for y in range(self.height + 1)]
-                + [SegmentPos(Coordinate(x, y), SegmentDirection.Y)
+                + [SegmentPos.of(Coordinate.of(x, y), SegmentDirection.Y)
                    for x in range(self.width + 1) for y in range(self.height)])
 
     def grid_positions(self) -> list[Coordinate]:
-        return [Coordinate(x, y, type=CoordinateType.Grid)
+        return [Coordinate.of(x, y, CoordinateType.Grid)
                 for x in range(self.width) for y in range(self.height)]
 
     def positions(self) -> list[Position]:
@@ -95,98 +145,273 @@ class Board:
         return 0 <= point.x < self.width and 0 <= point.y < self.height
 
     def is_connected(self, pos: SegmentPos) -> bool:
-        return pos not in self.segments or self.segments[pos].connected
+        return (segment := self._segments.get(pos)) is None or segment.connected
+
+    def topology(self) -> Topology:
+        """The compiled lattice; kept until a segment is connected or disconnected."""
+        if self._topology is None:
+            self._topology = Topology(self)
+        return self._topology
+
+    def connected_nears(self, point: Coordinate) -> tuple[Coordinate, ...]:
+        """`nears` without the neighbours behind a disconnected segment."""
+        return self.topology().nears(point)
+
+    def copy(self) -> Self:
+        """A copy sharing every board object, which are immutable; costs one pointer copy per stored object."""
+        stats.count('copies.boards')
+        copied = Board(self.width, self.height, self.start_point, self.end_point)
+        copied._points.update(self._points)
+        copied._segments.update(self._segments)
+        copied._grids.update(self._grids)
+        copied._fingerprint = self._fingerprint
+        copied._constraints = self._constraints
+        copied._has_jack = self._has_jack
+        copied._topology = self._topology
+        return copied
 
-    def with_grid(self, pos: Coordinate, grid: Grid) -> Self:
-        copied = deepcopy(self)
-        copied.grids[pos] = grid
+    def fingerprint(self) -> int:
+        """Stable 64-bit structural hash of the board: geometry, disconnections and every shape with its position."""
+        if self._fingerprint is None:
+            value = feature('board', self.width, self.height,
+                            position_key(self.start_point), position_key(self.end_point))
+            for name in ('points', 'segments', 'grids'):
+                value += sum(obj.fingerprint(name, pos) for pos, obj in self.container(name).items())
+            self._fingerprint = value & MASK
+        return self._fingerprint
+
+    def _set(self, name: ContainerName, pos: Position, obj: BoardObject) -> None:
+        """
+        Puts `obj` at `pos`, or drops what is there if `obj` is a default; every edit of the board goes through here.
+        """
+        container: dict[Position, BoardObject] = getattr(self, '_' + name)
+        if self._fingerprint is not None:
+            if (old := container.get(pos)) is not None:
+                self._fingerprint -= old.fingerprint(name, pos)
+            self._fingerprint = (self._fingerprint + obj.fingerprint(name, pos)) & MASK
+        if obj.is_default():
+            container.pop(pos, None)
+        else:
+            container[pos] = obj
+        self._constraints = self._has_jack = None
+        if name == 'segments':
+            self._topology = None
+
+    def _get(self, name: ContainerName, pos: Position) -> BoardObject:
+        """The object at `pos`, or the default one if there is none."""
+        return getattr(self, '_' + name).get(pos, DEFAULTS[name])
+
+    def _replace(self, name: ContainerName, pos: Position, obj: BoardObject) -> Self:
+        copied = self.copy()
+        copied._set(name, pos, obj)
         return copied
 
+    def with_grid(self, pos: Coordinate, grid: Grid) -> Self:
+        return self._replace('grids', pos, grid)
+
     def with_segment(self, pos: SegmentPos, segment: Segment) -> Self:
-        copied = deepcopy(self)
-        copied.segments[pos] = segment
-        return copied
+        return self._replace('segments', pos, segment)
 
     def with_point(self, pos: Coordinate, point: Point) -> Self:
-        copied = deepcopy(self)
-        copied.points[pos] = point
-        return copied
+        return self._replace('points', pos, point)
 
     def without_one_shape(self) -> list[Self]:
-        diff_grid = [self.with_grid(grid, changed) for grid in self.grids.keys()
-                     for changed in self.grids[grid].without_one_shape()]
-        diff_segment = [self.with_segment(segment, changed) for segment in self.segments.keys()
-                        for changed in self.segments[segment].without_one_shape()]
-        diff_point = [self.with_point(point, changed) for point in self.points.keys()
-                      for changed in self.points[point].without_one_shape()]
+        diff_grid = [self.with_grid(pos, changed) for pos, grid in self._grids.items()
+                     for changed in grid.without_one_shape()]
+        diff_segment = [self.with_segment(pos, changed) for pos, segment in self._segments.items()
+                        for changed in segment.without_one_shape()]
+        diff_point = [self.with_point(pos, changed) for pos, point in self._points.items()
+                      for changed in point.without_one_shape()]
         return diff_grid + diff_segment + diff_point
 
-    def diff_jack(self, path: Path, jack_pos: Coordinate) -> list[tuple[Self, Self]]:
-        no_jack = self.with_grid(jack_pos, self.grids[jack_pos].without_jack())
-        part = self.find_including_part(jack_pos, path)
-        diff_grid = [(no_jack.with_grid(grid, changed), no_jack)
-                     for grid in part.grids
-                     if grid != jack_pos
-                     for changed in self.grids[grid].without_one_shape()]
-        diff_segment = [(no_jack.with_segment(segment, changed), no_jack)
-                        for segment in part.segments
-                        if segment not in path.segments
-                        for changed in self.segments[segment].without_one_shape()]
-        diff_point = [(no_jack.with_point(point, changed), no_jack)
-                      for point in part.points
-                      if point not in path.points
-                      for changed in self.points[point].without_one_shape()]
-        return diff_grid + diff_segment + diff_point
+    def shape_refs(self) -> list[ShapeRef]:
+        return [(name, pos, index) for name in ('points', 'segments', 'grids')
+                for pos, obj in self.container(name).items() for index in range(len(obj.shapes))]
+
+    def shape_at(self, ref: ShapeRef) -> Shape:
+        name, pos, index = ref
+        return self.container(name)[pos].shapes[index]
+
+    def keeping(self, kept: set[ShapeRef]) -> Self:
+        """A copy with only the `kept` shapes of this board; the objects left as they were stay shared."""
+        copied = self.copy()
+        for name in ('points', 'segments', 'grids'):
+            for pos, obj in self.container(name).items():
+                shapes = tuple(shape for index, shape in enumerate(obj.shapes) if (name, pos, index) in kept)
+                if len(shapes) != len(obj.shapes):
+                    copied._set(name, pos, obj.with_shapes(shapes))
+        return copied
+
+    def constraints(self) -> tuple[tuple[Position, Shape], ...]:
+        """
+        Every shape with its position: those that only look at the path first, so that a failing one is found
+        before any region is labelled, then cheapest `Shape.cost` first. Kept until the board is edited.
+        """
+        if self._constraints is None:
+            self._constraints = tuple(sorted(((pos, shape) for name in ('points', 'segments', 'grids')
+                                              for pos, obj in self.container(name).items() for shape in obj.shapes),
+                                             key=lambda constraint: (isinstance(constraint[1], RegionShape),
+                                                                     constraint[1].cost)))
+        return self._constraints
 
     def check(self, path: Path) -> bool:
-        jacks: list[Coordinate] = [pos for pos, grid in self.grids.items()
-                                   if any(isinstance(shape, Jack) for shape in grid.shapes)]
-        if len(jacks) != 0:
-            jack_pos = jacks[0]
-            return any(changed[0].check(path) and not changed[1].check(path)
-                       for changed in self.diff_jack(path, jack_pos))
-        else:
-            return (all(point.check(self, pos, path) for pos, point in self.points.items())
-                    and all(segment.check(self, pos, path) for pos, segment in self.segments.items())
-                    and all(grid.check(self, pos, path) for pos, grid in self.grids.items()))
+        with stats.timed('check'):
+            if self.has_jack():
+                passed = JackCheck(self, path, self.regions(path)).valid()
+            else:
+                passed = self.check_constraints(path)
+        stats.count('check.calls')
+        stats.count('check.passed', passed)
+        return passed
+
+    def check_constraints(self, path: Path) -> bool:
+        """`check` without a Jack; the regions are only labelled once a `RegionShape` is checked."""
+        regions: Regions | None = None
+        for pos, shape in self.constraints():
+            if regions is None and isinstance(shape, RegionShape):
+                regions = self.regions(path)
+            if not check_shape(shape, self, pos, path, regions):
+                return False
+        return True
+
+    def has_jack(self) -> bool:
+        """Kept until the board is edited, like `constraints`."""
+        if self._has_jack is None:
+            self._has_jack = any(isinstance(shape, Jack) for grid in self._grids.values() for shape in grid.shapes)
+        return self._has_jack
+
+    def reachable_points(self, path: Path, visited: Set[Coordinate]) -> set[Coordinate]:
+        """
+        Points the rest of `path` can still visit: those linked to its last point by connected segments
+        without crossing its `visited` points. The end point is included but never walked through.
+        """
+        reachable: set[Coordinate] = set()
+        stack: list[Coordinate] = [path.head]
+        while len(stack) != 0:
+            current = stack.pop()
+            if current == self.end_point:
+                continue
+            for near in self.connected_nears(current):
+                if near not in visited and near not in reachable:
+                    reachable.add(near)
+                    stack.append(near)
+        return reachable
+
+    def may_complete(self, path: Path, trail: Trail | None = None) -> bool:
+        """
+        Whether `path` might still be extended into a valid path. Never rejects a prefix of a valid path,
+        but may accept prefixes that will fail later. `trail`, if given, must hold `path`.
+        """
+        if path.head == self.end_point:
+            return True
+        if trail is None:
+            trail = Trail(path)
+        return self.may_pass(PartialPath(path, self.reachable_points(path, trail.points), trail))
+
+    def may_pass(self, partial: PartialPath) -> bool:
+        if self.end_point not in partial.reachable:
+            return False
+        if self.has_jack():
+            return True  # A Jack may remove any shape that looks unsatisfiable now
+        return all(shape.may_pass(self, pos, partial) for pos, shape in self.constraints())
+
+    def is_sealed(self, grid: Coordinate, partial: PartialPath) -> bool:
+        """
+        Whether the region containing `grid` is already final, i.e. no later segment can cut through it.
+        The answer holds for every grid the flood went through, which are all in that region, so it is kept
+        for them in `partial` and each region is flooded at most once per search node.
+        """
+        if (sealed := partial.sealed.get(grid)) is not None:
+            return sealed
+        grids: list[Coordinate] = [grid]
+        seen: set[Coordinate] = {grid}
+        sealed = True
+        index = 0
+        while sealed and index < len(grids):
+            for near, segment in self.grid_nears(grids[index]):
+                if segment not in partial.segments:
+                    if partial.may_use(self, segment):
+                        sealed = False
+                        break
+                    if near not in seen:
+                        seen.add(near)
+                        grids.append(near)
+            index += 1
+        for found in grids:
+            partial.sealed[found] = sealed
+        return sealed
+
+    def grid_nears(self, grid: Coordinate) -> tuple[tuple[Coordinate, SegmentPos], ...]:
+        """Grids next to `grid` in the board, each with the segment between them."""
+        return grid_nears(grid.x, grid.y, grid.type.value, self.width, self.height)
 
     def connect(self, pos: SegmentPos) -> None:
-        self.segments[pos].connected = True
+        self._set('segments', pos, self._get('segments', pos).with_connected(True))
 
     def disconnect(self, pos: SegmentPos) -> None:
-        self.segments[pos].connected = False
+        self._set('segments', pos, self._get('segments', pos).with_connected(False))
+
+    def _add_shape(self, name: ContainerName, pos: Position, shape: Shape) -> None:
+        obj = self._get(name, pos)
+        self._set(name, pos, obj.with_shapes(obj.shapes + (shape,)))
 
     def add_point_shape(self, x: int, y: int, shape: Shape) -> None:
-        self.points[Coordinate(x, y, type=CoordinateType.Point)].shapes.append(shape)
+        self._add_shape('points', Coordinate.of(x, y, CoordinateType.Point), shape)
 
     def add_segment_shape(self, pos: SegmentPos, shape: Shape) -> None:
-        self.segments[pos].shapes.append(shape)
+        self._add_shape('segments', pos, shape)
 
     def add_grid_shape(self, x: int, y: int, shape: Shape) -> None:
-        self.grids[Coordinate(x, y, type=CoordinateType.Grid)].shapes.append(shape)
+        pos = Coordinate.of(x, y, CoordinateType.Grid)
+        if not self.in_board_grid(pos):
+            raise ValueError(f'{pos} is not a grid of a {self.width}x{self.height} board')
+        self._add_shape('grids', pos, shape)
+
+    def remove_grid_shape(self, pos: Coordinate, shape: Shape) -> None:
+        grid = self._get('grids', pos)
+        shapes = list(grid.shapes)
+        shapes.remove(shape)
+        self._set('grids', pos, grid.with_shapes(tuple(shapes)))
+
+    def replace_grid_shape(self, pos: Coordinate, old: Shape, new: Shape) -> None:
+        grid = self._get('grids', pos)
+        shapes = list(grid.shapes)
+        shapes[shapes.index(old)] = new
+        self._set('grids', pos, grid.with_shapes(tuple(shapes)))
 
     def find_including_part(self, grid: Coordinate, path: Path) -> BoardPart:
-        grids: set[Coordinate] = set()
-
-        def finder(current: Coordinate, found: list[Coordinate] | None = None) -> None:
-            if found is None:
-                found = []
-            grids.add(current)
-            for d1, d2 in ((SegmentDirection.X, SegmentDirection.Y), (SegmentDirection.Y, SegmentDirection.X)):
-                if self.in_board_grid(near := current + d1) and SegmentPos(current + d1, d2) not in path.segments:
-                    if near not in found:
-                        finder(near, found + [current])
-                if self.in_board_grid(near := current - d1) and SegmentPos(current, d2) not in path.segments:
-                    if near not in found:
-                        finder(near, found + [current])
-
-        finder(grid)
+        return self.flood_part(grid, path.segment_set)
+
+    def flood_part(self, grid: Coordinate, segments: Set[SegmentPos]) -> BoardPart:
+        """The grids connected to `grid` without crossing any of `segments`."""
+        grids: set[Coordinate] = {grid}
+        stack: list[Coordinate] = [grid]
+        while len(stack) != 0:
+            current = stack.pop()
+            for near, segment in self.grid_nears(current):
+                if near not in grids and segment not in segments:
+                    grids.add(near)
+                    stack.append(near)
         return BoardPart(grids)
 
+    def regions(self, path: Path) -> Regions:
+        """Splits the board along `path` in one pass over the grids, collecting the shapes of each region."""
+        return self.regions_along(path.segment_set)
+
+    def regions_along(self, segments: Set[SegmentPos]) -> Regions:
+        """`regions`, for the path made of `segments`."""
+        regions = Regions()
+        for grid in self.grid_positions():
+            if grid not in regions.labels:
+                regions.add(self.flood_part(grid, segments))
+        for pos, grid in self._grids.items():
+            regions.add_shapes(pos, grid.shapes)
+        return regions
+
     def get_colors_in(self, grid: Coordinate, path: Path) -> list[ColorType]:
         return [shape.color for grid in self.find_including_part(grid, path).grids
-                for shape in self.grids[grid].shapes if isinstance(shape, Colored)]
+                for shape in self._get('grids', grid).shapes if isinstance(shape, Colored)]
 
     @staticmethod
     def get_segment_count(grid: Coordinate, path: Path) -> int:
-        return sum(near in path.segments for near in grid.nears())
+        return sum(near in path.segment_set for near in grid.nears())
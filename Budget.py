@@ -0,0 +1,84 @@
+from collections.abc import Callable
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import StrEnum
+from threading import Event
+from time import perf_counter
+from typing import TypeVar
+
+T = TypeVar('T')
+
+
+class SearchStatus(StrEnum):
+    Complete = 'complete'
+    NodeLimit = 'node_limit'
+    Deadline = 'deadline'
+    Cancelled = 'cancelled'
+
+
+class BudgetExceeded(Exception):
+    """Raised out of searches that have no partial result to return, such as the tiling of `Tiling.tile`."""
+
+    def __init__(self, status: SearchStatus):
+        super().__init__(status)
+        self.status = status
+
+
+@dataclass
+class Budget:
+    """
+    Limits of one request: at most `nodes` search nodes, until `deadline` (a `perf_counter` time), and until
+    `cancelled` is set, from any thread. Searches `spend` a node at a time and stop with what they found so far
+    once it returns False; `status` then says which limit ran out. A budget is shared by every search of a request.
+    """
+    nodes: int | None = None
+    deadline: float | None = None
+    cancelled: Event = field(default_factory=Event)
+    spent: int = 0
+    status: SearchStatus = SearchStatus.Complete
+
+    @staticmethod
+    def of(nodes: int | None = None, seconds: float | None = None) -> 'Budget':
+        return Budget(nodes, None if seconds is None else perf_counter() + seconds)
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+
+    @property
+    def exceeded(self) -> bool:
+        return self.status is not SearchStatus.Complete
+
+    def spend(self, nodes: int = 1) -> bool:
+        """Charges `nodes`; False once any limit has run out."""
+        self.spent += nodes
+        if self.status is SearchStatus.Complete:
+            if self.cancelled.is_set():
+                self.status = SearchStatus.Cancelled
+            elif self.nodes is not None and self.spent > self.nodes:
+                self.status = SearchStatus.NodeLimit
+            elif self.deadline is not None and perf_counter() > self.deadline:
+                self.status = SearchStatus.Deadline
+        return self.status is SearchStatus.Complete
+
+    def charge(self, nodes: int = 1) -> None:
+        """`spend` for searches with no partial result: raises `BudgetExceeded` instead of returning False."""
+        if not self.spend(nodes):
+            raise BudgetExceeded(self.status)
+
+
+# The budget of the search step running in this thread or task, see `within`
+active_budget: ContextVar[Budget | None] = ContextVar('active_budget', default=None)
+
+
+def within(budget: Budget | None, function: Callable[..., T], *args) -> T:
+    """
+    Calls `function(*args)` with `budget` as the `active_budget` of the searches nested in it, such as the tiling
+    of Block checks, which charge it without it being passed down to them.
+    """
+    if budget is None:
+        return function(*args)
+    token = active_budget.set(budget)
+    try:
+        return function(*args)
+    finally:
+        active_budget.reset(token)
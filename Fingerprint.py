@@ -0,0 +1,25 @@
+from functools import lru_cache
+from hashlib import blake2b
+
+from Position import Position, SegmentPos
+
+MASK = (1 << 64) - 1
+
+
+def position_key(pos: Position) -> tuple:
+    """
+    Plain values of `pos`, with its `CoordinateType`: positions that differ only in type compare equal,
+    but lookups by a typed position (e.g. in `JackCheck`) can tell them apart, so they may solve differently.
+    """
+    if isinstance(pos, SegmentPos):
+        return pos.coordinate.x, pos.coordinate.y, pos.coordinate.type.value, str(pos.direction)
+    return pos.x, pos.y, pos.type.value
+
+
+@lru_cache(maxsize=65536)
+def feature(*parts) -> int:
+    """
+    Random-looking 64-bit key of one board feature, in the spirit of Zobrist hashing.
+    Derived from the feature itself rather than a random table, so it is the same in every process and run.
+    """
+    return int.from_bytes(blake2b(repr(parts).encode(), digest_size=8).digest())
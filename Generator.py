@@ -1,65 +1,97 @@
 from abc import ABC, abstractmethod
-from copy import deepcopy
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from itertools import combinations
-from random import randint, choice, shuffle
+from random import Random
 from typing import Generator
 
-from Board import Board
-from Path import Path, find_paths
+from Board import Board, Point, Segment, Grid
+from Budget import Budget, SearchStatus
+from Path import Path, search_paths
 from Position import Position, is_point, is_segment, Coordinate, SegmentPos, is_grid, common_parts
 from Shape import Hexagon, Colors, Square, ColorType, Block, Star, Triangle, Shape, Jack
+from SolveCache import SolveCache, Solutions, solve_cache
+from Minimise import Minimiser, Strategy
+from Stats import stats as global_stats
 
 
 class Action(ABC):
     @abstractmethod
-    def apply_on(self, board: Board, solution: Path) -> None:
+    def apply_on(self, board: Board, solution: Path, rng: Random) -> None:
         ...
 
+    def restricts(self, board: Board) -> bool:
+        """
+        Whether applying this action to `board` can only take valid paths away, never make an invalid one valid.
+        Jacks are left to the caller: on a board with one, any new shape might be what makes a Jack useful.
+        """
+        return False
+
+
+def has_stars(board: Board, color: ColorType | None = None) -> bool:
+    """Whether `board` has a Star (of `color`, if given), whose count another Colored shape could complete."""
+    return any(isinstance(shape, Star) and (color is None or shape.color == color)
+               for _, shape in board.constraints())
+
 
 @dataclass
 class PointHexagonAction(Action):
     position: Coordinate
 
-    def apply_on(self, board: Board, solution: Path) -> None:
+    def apply_on(self, board: Board, solution: Path, rng: Random) -> None:
         board.add_point_shape(self.position.x, self.position.y, Hexagon())
 
+    def restricts(self, board: Board) -> bool:
+        return True
+
 
 @dataclass
 class SegmentDisconnectAction(Action):
     position: SegmentPos
 
-    def apply_on(self, board: Board, solution: Path) -> None:
+    def apply_on(self, board: Board, solution: Path, rng: Random) -> None:
         board.disconnect(self.position)
 
+    def restricts(self, board: Board) -> bool:
+        return True
+
 
 @dataclass
 class GridSquareAction(Action):
     position: Coordinate
 
-    def apply_on(self, board: Board, solution: Path) -> None:
+    def apply_on(self, board: Board, solution: Path, rng: Random) -> None:
         colors = board.get_colors_in(self.position, solution)
-        color = choice(list(Colors)) if len(colors) == 0 else colors[0]
+        color = rng.choice(list(Colors)) if len(colors) == 0 else colors[0]
         board.add_grid_shape(self.position.x, self.position.y, Square(color))
 
+    def restricts(self, board: Board) -> bool:
+        return not has_stars(board)  # The colour is only drawn when applied
+
 
 @dataclass
 class GridAddBlockAction(Action):
     position: Coordinate
 
-    def apply_on(self, board: Board, solution: Path) -> None:
+    def apply_on(self, board: Board, solution: Path, rng: Random) -> None:
         part = board.find_including_part(self.position, solution).rotatable()
         board.add_grid_shape(self.position.x, self.position.y, Block(part))
 
+    def restricts(self, board: Board) -> bool:
+        # Another Block could be what a region of some other path was missing to be tiled
+        return not any(isinstance(shape, Block) for _, shape in board.constraints())
+
 
 @dataclass
 class GridFixBlockAction(Action):
     position: Coordinate
 
-    def apply_on(self, board: Board, solution: Path) -> None:
-        for shape in board.grids[self.position].shapes:
+    def apply_on(self, board: Board, solution: Path, rng: Random) -> None:
+        for shape in board.grids.get(self.position, Grid()).shapes:
             if isinstance(shape, Block):
-                shape.shape.rotate = False
+                board.replace_grid_shape(self.position, shape, Block(replace(shape.shape, rotate=False)))
+
+    def restricts(self, board: Board) -> bool:
+        return True
 
 
 @dataclass
@@ -68,9 +100,9 @@ class GridSplitBlockAction(Action):
     split_positions: tuple[Coordinate, Coordinate]
     block: Block
 
-    def apply_on(self, board: Board, solution: Path) -> None:
-        parts = self.block.shape.split()
-        board.grids[self.position].shapes.remove(self.block)
+    def apply_on(self, board: Board, solution: Path, rng: Random) -> None:
+        parts = self.block.shape.split(rng)
+        board.remove_grid_shape(self.position, self.block)
         for i in [0, 1]:
             board.add_grid_shape(self.split_positions[i].x, self.split_positions[i].y, Block(parts[i]))
 
@@ -80,73 +112,82 @@ class GridSingleStarAction(Action):
     position: Coordinate
     color: ColorType
 
-    def apply_on(self, board: Board, solution: Path) -> None:
+    def apply_on(self, board: Board, solution: Path, rng: Random) -> None:
         board.add_grid_shape(self.position.x, self.position.y, Star(self.color))
 
+    def restricts(self, board: Board) -> bool:
+        return not has_stars(board, self.color)
+
 
 @dataclass
 class GridDoubleStarAction(Action):
     positions: tuple[Coordinate, Coordinate]
 
-    def apply_on(self, board: Board, solution: Path) -> None:
+    def apply_on(self, board: Board, solution: Path, rng: Random) -> None:
         colors = board.get_colors_in(self.positions[0], solution)
-        unused = set(Colors) - set(colors)
-        color = choice(list(unused))
+        unused = [color for color in Colors if color not in colors]
+        color = rng.choice(unused)
         for i in [0, 1]:
             board.add_grid_shape(self.positions[i].x, self.positions[i].y, Star(color))
 
+    def restricts(self, board: Board) -> bool:
+        return not has_stars(board)
+
 
 @dataclass
 class GridTriangleAction(Action):
     position: Coordinate
 
-    def apply_on(self, board: Board, solution: Path) -> None:
+    def apply_on(self, board: Board, solution: Path, rng: Random) -> None:
         segment_count = board.get_segment_count(self.position, solution)
         board.add_grid_shape(self.position.x, self.position.y, Triangle(segment_count))
 
+    def restricts(self, board: Board) -> bool:
+        return True
+
 
 @dataclass
 class GridJackAction(Action):
     position: Coordinate
 
     @staticmethod
-    def get_random_grid_shape() -> Shape:
-        match randint(0, 3):
+    def get_random_grid_shape(rng: Random) -> Shape:
+        match rng.randint(0, 3):
             case 0:
-                return Square(choice(list(Colors)))
+                return Square(rng.choice(list(Colors)))
             case 1:
-                return Block(choice(common_parts))
+                return Block(rng.choice(common_parts))
             case 2:
-                return Star(choice(list(Colors)))
+                return Star(rng.choice(list(Colors)))
             case 3:
-                return Triangle(randint(1, 3))
+                return Triangle(rng.randint(1, 3))
             case _:
                 raise NotImplementedError
 
-    def apply_on(self, board: Board, solution: Path) -> None:
+    def apply_on(self, board: Board, solution: Path, rng: Random) -> None:
         part = board.find_including_part(self.position, solution).rotatable()
         spaces: set[Coordinate] = {grid for grid in part.grids
-                                   if len(board.grids[grid].shapes) == 0 and grid != self.position}
-        space = choice(list(spaces))
+                                   if grid not in board.grids and grid != self.position}
+        space = rng.choice(list(spaces))
         board.add_grid_shape(self.position.x, self.position.y, Jack())
-        board.add_grid_shape(space.x, space.y, self.get_random_grid_shape())
+        board.add_grid_shape(space.x, space.y, self.get_random_grid_shape(rng))
 
 
-def get_actions_on(board: Board, pos: Position, solution: Path) -> Generator[Action, None, None]:
+def get_actions_on(board: Board, pos: Position, solution: Path, rng: Random) -> Generator[Action, None, None]:
     if is_point(pos):
-        if (pos in solution.points and pos not in [board.start_point, board.end_point]
-                and not any(isinstance(shape, Hexagon) for shape in board.points[pos].shapes)):
+        if (pos in solution.point_set and pos not in [board.start_point, board.end_point]
+                and not any(isinstance(shape, Hexagon) for shape in board.points.get(pos, Point()).shapes)):
             yield PointHexagonAction(pos)
     if is_segment(pos):
-        if pos not in solution.segments and board.segments[pos].connected:
+        if pos not in solution.segment_set and board.segments.get(pos, Segment()).connected:
             yield SegmentDisconnectAction(pos)
     if is_grid(pos):
-        grid = board.grids[pos]
+        grid = board.grids.get(pos, Grid())
         grids: set[Coordinate] = board.find_including_part(pos, solution).grids
         colors: list[ColorType] = board.get_colors_in(pos, solution)
-        shuffle(colors)
+        rng.shuffle(colors)
         single_colors: list[ColorType] = [color for color in colors if colors.count(color) == 1]
-        spaces: set[Coordinate] = {grid for grid in grids if len(board.grids[grid].shapes) == 0 and grid != pos}
+        spaces: set[Coordinate] = {grid for grid in grids if grid not in board.grids and grid != pos}
         if len(grid.shapes) == 0:
             if board.get_segment_count(pos, solution) != 0:
                 yield GridTriangleAction(pos)
@@ -154,7 +195,7 @@ def get_actions_on(board: Board, pos: Position, solution: Path) -> Generator[Act
                     yield GridJackAction(pos)
             if len(set(colors)) <= 1:
                 yield GridSquareAction(pos)
-            if not any(isinstance(shape, Block) for grid in grids for shape in board.grids[grid].shapes):
+            if not any(isinstance(shape, Block) for grid in grids for shape in board.grids.get(grid, Grid()).shapes):
                 yield GridAddBlockAction(pos)
             if len(set(colors)) < len(list(Colors)):
                 for combination in combinations(spaces.union({pos}), 2):
@@ -170,45 +211,199 @@ def get_actions_on(board: Board, pos: Position, solution: Path) -> Generator[Act
                     yield GridSplitBlockAction(pos, combination, shape)
 
 
-def get_actions(board: Board, solution: Path) -> list[Action]:
-    return [action for pos in board.positions() for action in get_actions_on(board, pos, solution)]
-
-
-def generate(board: Board, solution: Path) -> Generator[Board, None, None]:
-    def finder(modified: Board) -> Generator[Board, None, None]:
-        paths = find_paths(modified)
-        if len(paths) == 0:
-            return
-        if len(paths) == 1:
-            yield modified
-            return
-        actions: list[Action] = get_actions(modified, solution)
-        shuffle(actions)
-        for action in actions:
-            copied = deepcopy(modified)
-            action.apply_on(copied, solution)
-            yield from finder(copied)
-
-    def trim_shapes(modified: Board) -> Generator[Board, None, None]:
-        if len(find_paths(modified)) != 1:
-            return
-        for container in [modified.points, modified.segments, modified.grids]:
-            deletable = [key for key in container.keys() if container[key].is_default()]
-            for key in deletable:
-                del container[key]
-        trims = [trimmed for trimmed in modified.without_one_shape() if len(find_paths(trimmed)) == 1]
-        if len(trims) == 0:
-            yield modified
+def get_actions(board: Board, solution: Path, rng: Random) -> list[Action]:
+    return [action for pos in board.positions() for action in get_actions_on(board, pos, solution, rng)]
+
+
+@dataclass
+class GenerationStats:
+    visited: int = 0  # Distinct boards the search went through
+    deduplicated: int = 0  # Boards skipped because another order of the same actions already reached them
+
+
+@dataclass
+class Node:
+    """A board of the search frontier, with its valid paths and the actions still to try on it."""
+    board: Board
+    solutions: Solutions
+    actions: list[Action]
+    next: int = 0
+    searched: int = 0  # Children it restricts that were solved by a search
+
+
+class GenerationSession:
+    """
+    Unique-solution puzzles built on `board` around `solution`, handed out one at a time by `next`.
+    The depth-first search is kept as an explicit frontier, so each request resumes it where the last one stopped;
+    the boards it searched, the path counts, the `Minimiser` and the puzzles already handed out are kept too,
+    so no board is searched twice (many actions commute) and no puzzle is handed out twice.
+    A puzzle's only valid path is not always `solution`: `solution_of` gives the path it was built for.
+    Boards of the frontier keep their valid paths, when they have fewer than `alternatives` of them: most actions
+    only restrict a board (see `Action.restricts`), so the paths of their result are found by checking those again.
+    """
+
+    def __init__(self, board: Board, solution: Path, rng: Random | None = None,
+                 stats: GenerationStats | None = None, cache: SolveCache | None = None,
+                 alternatives: int = 64, patience: int = 2, strategy: Strategy = 'greedy'):
+        self.solution = solution
+        self.alternatives = alternatives
+        self.patience = patience
+        self.rng = rng if rng is not None else Random()
+        self.stats = stats if stats is not None else GenerationStats()
+        self.cache = cache if cache is not None else SolveCache(maxsize=1 << 16)
+        self.visited: set[int] = set()
+        self.minimiser = Minimiser(self.cache, strategy)
+        self.emitted: dict[int, Path] = {}  # The only valid path of each puzzle handed out, by fingerprint
+        self.frontier: list[Node] = []
+        # The board to solve next, with its parent's paths if it only restricts that, and its parent's other paths
+        self.pending: tuple[Board, Solutions | None, list[Path]] | None = (board.copy(), None, [])
+
+    def solve(self, board: Board, parent: Solutions | None, budget: Budget | None = None) -> Solutions | None:
+        """
+        The valid paths of `board`, or two of them if it has more; None if `budget` ran out first.
+        With `parent`, the complete paths of a board that `board` only restricts, the search is skipped:
+        the paths of `board` are those of `parent` it still allows.
+        """
+        if parent is None:
+            result = search_paths(board, budget, limit=2, cache=self.cache)
+            if result.status != SearchStatus.Complete:
+                return None
+            return Solutions(result.paths, complete=len(result.paths) < 2)
+        if (cached := self.cache.get(board)) is not None and (cached.complete or len(cached.paths) >= 2):
+            return cached
+        global_stats.count('generate.narrowed')
+        paths = [path for path in parent.paths
+                 if all(board.is_connected(segment) for segment in path.segments) and board.check(path)]
+        solutions = Solutions(paths, complete=True)
+        self.cache.put(board, solutions)
+        return solutions
+
+    def known_paths(self, node: Node, budget: Budget | None = None) -> Solutions | None:
+        """
+        The complete paths of a frontier board, for a child it only restricts. They are only enumerated (up to
+        `alternatives` of them) once `patience` such children were searched: that costs more than one count does.
+        """
+        if not node.solutions.complete and node.searched == self.patience:
+            result = search_paths(node.board, budget, limit=self.alternatives, cache=self.cache)
+            if result.status != SearchStatus.Complete:
+                return None  # Tried again for the next child
+            node.solutions = Solutions(result.paths, complete=len(result.paths) < self.alternatives)
+        node.searched += 1
+        return node.solutions if node.solutions.complete else None
+
+    def enter(self, board: Board, parent: Solutions | None, alternatives: list[Path],
+              budget: Budget | None = None) -> tuple[Board, Path] | None:
+        """
+        Solves a board reached by the search: pushes it if it has several paths, or minimises it if only one
+        and gives the puzzle with that path.
+        `alternatives` are paths of the board it came from, which the minimiser can test candidates against.
+        The board is only marked visited once solved, so one that `budget` cut short is solved again later.
+        """
+        if (fingerprint := board.fingerprint()) in self.visited:
+            self.stats.deduplicated += 1
+            return None
+        if (solutions := self.solve(board, parent, budget)) is None:
+            return None
+        self.visited.add(fingerprint)
+        self.stats.visited += 1
+        if len(solutions.paths) == 0:
+            global_stats.count('generate.backtracks')
+        elif len(solutions.paths) == 1 and solutions.complete:
+            self.minimiser.learn(alternatives)
+            path = solutions.paths[0]
+            # None only if `budget` ran out before the minimiser saw the path was the only one
+            return self.minimiser.minimise(board, path, budget) or board, path
         else:
-            for trimmed in trims:
-                yield from trim_shapes(trimmed)
+            actions = get_actions(board, self.solution, self.rng)
+            self.rng.shuffle(actions)
+            self.frontier.append(Node(board, solutions, actions))
+        return None
+
+    def offer(self, found: tuple[Board, Path] | None) -> Board | None:
+        """The puzzle of `found`, unless it was handed out already."""
+        if found is None or (fingerprint := found[0].fingerprint()) in self.emitted:
+            return None
+        puzzle, self.emitted[fingerprint] = found
+        return puzzle
+
+    def solution_of(self, puzzle: Board) -> Path:
+        """The only valid path of a puzzle this session handed out."""
+        return self.emitted[puzzle.fingerprint()]
+
+    def next(self, budget: Budget | None = None) -> Board | None:
+        """
+        The next puzzle not handed out yet, or None once the search is over or `budget` ran out.
+        Each board the search goes through is charged to `budget`, on top of the path searches on it.
+        Once it runs out, `budget.status` says why; the puzzle given then, if any, may not be minimal yet,
+        and the next call picks the search up where it stopped, from the board it was solving: a budget too small
+        for the path search of a single board never gets past it.
+        """
+        with global_stats.timed('generate'):
+            return self.advance(budget)
+
+    def advance(self, budget: Budget | None) -> Board | None:
+        """`next`, untimed."""
+        while budget is None or budget.spend():
+            if self.pending is None:
+                if len(self.frontier) == 0:
+                    return None
+                node = self.frontier[-1]
+                if node.next == len(node.actions):
+                    self.frontier.pop()
+                    continue
+                action = node.actions[node.next]
+                node.next += 1
+                global_stats.count('generate.actions_tried')
+                restricts = not node.board.has_jack() and action.restricts(node.board)
+                copied = node.board.copy()
+                action.apply_on(copied, self.solution, self.rng)
+                parent = self.known_paths(node, budget) if restricts else None
+                self.pending = (copied, parent, node.solutions.paths)
+            board, parent, alternatives = self.pending
+            found = self.enter(board, parent, alternatives, budget)
+            if board.fingerprint() not in self.visited:
+                return None  # Cut short by `budget`; still pending
+            self.pending = None
+            if (puzzle := self.offer(found)) is not None:
+                return puzzle
+        return None
+
+    def take(self, count: int) -> Generator[Board, None, None]:
+        """Up to `count` more puzzles."""
+        for _ in range(count):
+            if (generated := self.next()) is None:
+                return
+            yield generated
+
+    def __iter__(self) -> Generator[Board, None, None]:
+        while (generated := self.next()) is not None:
+            yield generated
+
+
+def generate(board: Board, solution: Path, rng: Random | None = None, stats: GenerationStats | None = None,
+             cache: SolveCache | None = solve_cache) -> Generator[Board, None, None]:
+    """Every puzzle of a `GenerationSession`; every random choice is drawn from `rng`."""
+    yield from GenerationSession(board, solution, rng, stats, cache)
+
+
+def task_rng(seed: int | None, index: int) -> Random:
+    """The random generator of the `index`-th task of a batch; the same for every run and process given a seed."""
+    return Random() if seed is None else Random(f'{seed}:{index}')
+
 
-    for found in finder(deepcopy(board)):
-        yield from trim_shapes(found)
+def generate_one(board: Board, solution: Path, rng: Random, cache: SolveCache | None = solve_cache,
+                 budget: Budget | None = None) -> Board | None:
+    return GenerationSession(board, solution, rng, cache=cache).next(budget)
 
 
-def generate_part(board: Board, solution: Path, count: int) -> Generator[Board, None, None]:
-    for _ in range(count):
-        for generated in generate(board, solution):
+def generate_part(board: Board, solution: Path, count: int,
+                  seed: int | None = None) -> Generator[Board, None, None]:
+    """
+    Up to `count` puzzles from independent searches; with a seed, the same as `Parallel.generate_parallel`.
+    The searches share one cache of path counts, so the boards they all start through are only solved once.
+    For a stream of distinct puzzles from one search, use a `GenerationSession`.
+    """
+    cache = SolveCache(maxsize=1 << 16)
+    for index in range(count):
+        if (generated := generate_one(board, solution, task_rng(seed, index), cache)) is not None:
             yield generated
-            break
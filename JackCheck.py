@@ -0,0 +1,90 @@
+from typing import TYPE_CHECKING
+
+from Path import Path
+from Position import Coordinate, Position
+from Region import Regions
+from Shape import Shape, Jack
+from Stats import check_shape
+
+if TYPE_CHECKING:
+    from Board import Board, ContainerName
+
+type Entry = tuple['ContainerName', Position, int]  # A shape, as its container, position and index there
+
+
+class JackCheck:
+    """
+    Checks one path on a board with Jacks, without building any board.
+    The first Jack passes if the board without it fails, but the board without it and without exactly one other
+    shape of its region (or of the points and segments around that region off the path) passes. Further Jacks
+    are handled the same way on what is left. Shapes are removed by marking their entries, and each set of
+    removed shapes is decided once.
+    """
+
+    def __init__(self, board: 'Board', path: Path, regions: Regions):
+        self.board = board
+        self.path = path
+        self.regions = regions
+        self.path_points: frozenset[Coordinate] = path.point_set
+        self.path_segments = path.segment_set
+        shapes: dict[Entry, Shape] = {(name, pos, i): shape
+                                      for name in ('points', 'segments', 'grids')
+                                      for pos, obj in getattr(board, name).items()
+                                      for i, shape in enumerate(obj.shapes)}
+        self.jacks: list[Entry] = [entry for entry, shape in shapes.items()
+                                   if entry[0] == 'grids' and isinstance(shape, Jack)]
+        self.shapes: dict[Entry, Shape] = dict(sorted(shapes.items(), key=lambda item: item[1].cost))
+        self.results: dict[frozenset[Entry], bool] = {}
+
+    def regions_without(self, removed: frozenset[Entry]) -> Regions:
+        return self.regions.without([(pos, self.shapes[(name, pos, i)])
+                                     for name, pos, i in removed if name == 'grids'])
+
+    def passes(self, removed: frozenset[Entry], entries: list[Entry] | None = None) -> bool:
+        """Whether every shape of `entries` (by default all of them) that is not removed passes."""
+        regions = self.regions_without(removed)
+        return all(check_shape(self.shapes[entry], self.board, entry[1], self.path, regions)
+                   for entry in (self.shapes if entries is None else entries)
+                   if entry not in removed and not isinstance(self.shapes[entry], Jack))
+
+    def candidates(self, jack: Entry, removed: frozenset[Entry]) -> list[Entry]:
+        """The shapes `jack` may remove."""
+        jack_pos = jack[1]
+        part = self.regions[jack_pos].part
+        positions: list[tuple['ContainerName', Position]] = (
+                [('grids', grid) for grid in part.grids if grid != jack_pos]
+                + [('segments', segment) for segment in part.segments if segment not in self.path_segments]
+                + [('points', point) for point in part.points if point not in self.path_points])
+        return [(name, pos, i) for name, pos in positions
+                if (obj := getattr(self.board, name).get(pos)) is not None
+                for i in range(len(obj.shapes))
+                if (name, pos, i) not in removed]
+
+    def valid(self, removed: frozenset[Entry] = frozenset()) -> bool:
+        if removed in self.results:
+            return self.results[removed]
+        jacks = [jack for jack in self.jacks if jack not in removed]
+        if len(jacks) == 0:
+            result = self.passes(removed)
+        else:
+            jack = jacks[0]
+            without_jack = removed | {jack}
+            candidates = self.candidates(jack, without_jack)
+            if self.valid(without_jack):
+                result = False
+            elif len(jacks) == 1:
+                # Removing a candidate only changes the shapes of this Jack's region and the candidate itself,
+                # so everything else is checked once instead of once per candidate
+                region = self.regions[jack[1]].part.grids
+                removable = set(candidates)
+                local: list[Entry] = []
+                others: list[Entry] = []
+                for entry in self.shapes:
+                    is_local = (entry[0] == 'grids' and entry[1] in region) or entry in removable
+                    (local if is_local else others).append(entry)
+                result = (self.passes(without_jack, others)
+                          and any(self.passes(without_jack | {candidate}, local) for candidate in candidates))
+            else:
+                result = any(self.valid(without_jack | {candidate}) for candidate in candidates)
+        self.results[removed] = result
+        return result
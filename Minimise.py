@@ -0,0 +1,125 @@
+from collections import deque
+from typing import Literal, Iterable
+
+from Board import Board, ShapeRef
+from Budget import Budget, SearchStatus
+from Path import Path, search_paths
+from Position import Coordinate
+from SolveCache import SolveCache, solve_cache
+from Stats import stats, check_shape
+
+type Strategy = Literal['greedy', 'ddmin']
+
+
+def allows(board: Board, path: Path) -> bool:
+    """Whether `path` is a valid path of `board`: over connected segments only, and passing `Board.check`."""
+    return all(board.is_connected(segment) for segment in path.segments) and board.check(path)
+
+
+class Minimiser:
+    """
+    Removes shapes from unique-solution puzzles until no single shape can go without another valid path
+    appearing, i.e. until they are 1-minimal.
+    Whether a set of shapes keeps a path the only valid one is memoised by board fingerprint, and every valid path
+    met on the way is kept: a candidate that another of those still passes is rejected without a search.
+    Shapes that rule out the most known paths are the likeliest to be needed, so they are tried last.
+    """
+
+    def __init__(self, cache: SolveCache | None = solve_cache, strategy: Strategy = 'greedy', known: int = 64):
+        self.cache = cache
+        self.strategy = strategy
+        self.unique: dict[tuple[int, tuple[Coordinate, ...]], bool] = {}
+        self.alternatives: deque[Path] = deque(maxlen=known)
+
+    def learn(self, paths: Iterable[Path]) -> None:
+        """Keeps `paths` for rejecting candidates without a search."""
+        self.alternatives.extend(paths)
+
+    def others(self, solution: Path) -> list[Path]:
+        """The known paths other than `solution`."""
+        return [path for path in self.alternatives if path.points != solution.points]
+
+    def solutions(self, board: Board, budget: Budget | None = None) -> list[Path] | None:
+        """Two valid paths of `board`, or all of them if it has fewer; None if `budget` ran out first."""
+        stats.count('minimise.searches')
+        result = search_paths(board, budget, limit=2, cache=self.cache)
+        return result.paths if result.status == SearchStatus.Complete else None
+
+    def is_unique(self, board: Board, solution: Path, budget: Budget | None = None) -> bool:
+        """Whether `solution` is the only valid path of `board`; False if `budget` ran out before that was known."""
+        if (key := (board.fingerprint(), tuple(solution.points))) in self.unique:
+            stats.count('minimise.memo_hits')
+            return self.unique[key]
+        if not board.check(solution):
+            unique = False
+        elif any(allows(board, path) for path in self.others(solution)):
+            stats.count('minimise.known_rejections')
+            unique = False
+        elif (paths := self.solutions(board, budget)) is None:
+            return False
+        else:
+            self.learn(paths)
+            unique = all(path.points == solution.points for path in paths)
+        self.unique[key] = unique
+        return unique
+
+    def order(self, board: Board, solution: Path, refs: list[ShapeRef]) -> list[ShapeRef]:
+        """`refs` by how many of the known paths their shape rules out on `board`, fewest first, cheapest last."""
+        regions = [(path, board.regions(path)) for path in self.others(solution)]
+
+        def ruled_out(ref: ShapeRef) -> int:
+            shape = board.shape_at(ref)
+            return sum(not check_shape(shape, board, ref[1], path, path_regions) for path, path_regions in regions)
+
+        return sorted(refs, key=lambda ref: (ruled_out(ref), -board.shape_at(ref).cost))
+
+    def greedy(self, board: Board, solution: Path, budget: Budget | None = None) -> set[ShapeRef]:
+        """Drops shapes one at a time, in `order`, and goes over the rest again until a pass drops none."""
+        refs = board.shape_refs()
+        kept = set(refs)
+        removed = True
+        while removed:
+            removed = False
+            for ref in self.order(board, solution, [ref for ref in refs if ref in kept]):
+                if budget is not None and budget.exceeded:
+                    return kept
+                if self.is_unique(board.keeping(kept - {ref}), solution, budget):
+                    kept.remove(ref)
+                    removed = True
+        return kept
+
+    def ddmin(self, board: Board, solution: Path, budget: Budget | None = None) -> set[ShapeRef]:
+        """
+        Delta debugging: keeps one chunk of the shapes, or drops one, if the puzzle stays unique,
+        and splits the shapes into chunks twice as small once no chunk works, down to single shapes.
+        """
+        kept = self.order(board, solution, board.shape_refs())[::-1]  # The likeliest to be needed first
+        chunks = 2
+        while len(kept) >= 2 and (budget is None or not budget.exceeded):
+            size = -(-len(kept) // chunks)
+            parts = [kept[start:start + size] for start in range(0, len(kept), size)]
+            complements = [[ref for ref in kept if ref not in part] for part in parts]
+            for index, candidate in enumerate(parts + complements):
+                if self.is_unique(board.keeping(set(candidate)), solution, budget):
+                    chunks = 2 if index < len(parts) else max(chunks - 1, 2)
+                    kept = candidate
+                    break
+            else:
+                if chunks >= len(kept):
+                    break
+                chunks = min(chunks * 2, len(kept))
+        if len(kept) == 1 and self.is_unique(board.keeping(set()), solution, budget):
+            kept = []
+        return set(kept)
+
+    def minimise(self, board: Board, solution: Path, budget: Budget | None = None) -> Board | None:
+        """
+        A 1-minimal puzzle made of shapes of `board`, or None if `solution` is not its only valid path.
+        If `budget` runs out on the way, the puzzle is the one reached by then: still unique, but maybe not minimal.
+        """
+        with stats.timed('minimise'):
+            if not self.is_unique(board, solution, budget):
+                return None
+            strategy = self.greedy if self.strategy == 'greedy' else self.ddmin
+            kept = strategy(board, solution, budget)
+            return board.keeping(kept)
@@ -0,0 +1,136 @@
+import os
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor, Future, as_completed, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Generator
+
+from Board import Board
+from Budget import Budget, SearchStatus
+from Generator import generate_one, task_rng
+from Path import Path, extensions, search_paths
+from Serialization import Puzzle
+
+
+def generate_task(board: Board, solution: Path, seed: int, index: int) -> Board | None:
+    return generate_one(board, solution, task_rng(seed, index))
+
+
+def generate_parallel(board: Board, solution: Path, count: int, seed: int,
+                      workers: int | None = None) -> Generator[tuple[int, Board], None, None]:
+    """
+    Runs the `count` searches of `generate_part` on a pool of `workers` processes.
+    Yields (task index, puzzle) as soon as each search finishes; task `i` always draws from `task_rng(seed, i)`,
+    so sorting by index gives exactly what `generate_part(board, solution, count, seed)` yields.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(generate_task, board, solution, seed, index): index for index in range(count)}
+        for future in as_completed(futures):
+            if (generated := future.result()) is not None:
+                yield futures[future], generated
+
+
+worker_board: Board | None = None  # Set in each solver process by `set_worker_board`
+
+
+def set_worker_board(board: Board) -> None:
+    global worker_board
+    worker_board = board
+
+
+def search_prefix(prefix: Path, chunk: int, prune: bool) -> tuple[list[Path], list[Path]]:
+    """
+    Depth-first search below `prefix` that stops after expanding `chunk` paths.
+    Returns the valid paths found and the prefixes still to explore, both in search order.
+    """
+    board = worker_board
+    found: list[Path] = []
+    stack: list[Path] = [prefix]
+    expanded = 0
+    while len(stack) != 0 and expanded < chunk:
+        current = stack.pop()
+        expanded += 1
+        if current.head == board.end_point:
+            if board.check(current):
+                found.append(current)
+            continue
+        stack.extend(reversed(extensions(board, current, prune)))
+    return found, stack[::-1]
+
+
+def find_paths_parallel(board: Board, workers: int | None = None, *, prefixes_per_worker: int = 8,
+                        chunk: int = 5000, prune: bool = True) -> list[Path]:
+    """
+    `find_paths` spread over a pool of processes, giving the same paths in the same order.
+    The search tree is first expanded breadth-first into a frontier of prefixes, which are searched in parallel.
+    A prefix that is not finished within `chunk` expanded paths hands its remaining sub-prefixes back to the pool,
+    so heavy subtrees keep being split among idle workers.
+    Every prefix carries a key (its branch indices), and sorting by key restores the serial search order.
+    """
+    workers = workers or os.cpu_count() or 1
+    root = Path(board.start_point, board.end_point)
+    frontier: list[tuple[tuple[int, ...], Path]] = [((), root)]
+    while len(frontier) < workers * prefixes_per_worker:
+        expanded = [(key + (i,), extended) for key, prefix in frontier
+                    for i, extended in enumerate(extensions(board, prefix, prune)
+                                                 if prefix.head != board.end_point else [prefix])]
+        if len(expanded) == len(frontier):
+            break
+        frontier = expanded
+
+    results: list[tuple[tuple[int, ...], Path]] = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=set_worker_board, initargs=(board,)) as executor:
+        pending: dict[Future, tuple[int, ...]] = {executor.submit(search_prefix, prefix, chunk, prune): key
+                                                  for key, prefix in frontier}
+        while len(pending) != 0:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = pending.pop(future)
+                found, remaining = future.result()
+                results.extend((key + (0, i), path) for i, path in enumerate(found))
+                for i, prefix in enumerate(remaining):
+                    pending[executor.submit(search_prefix, prefix, chunk, prune)] = key + (i + 1,)
+    results.sort(key=lambda result: result[0])
+    return [path for _, path in results]
+
+
+@dataclass
+class SolveResult:
+    index: int  # Of the puzzle in its input
+    paths: list[Path]
+    seconds: float
+    expected: bool | None  # Whether the solution stored with the puzzle is among `paths`; None if it had none
+    status: SearchStatus = SearchStatus.Complete  # Anything else means `paths` may be missing some
+
+
+def solve_task(index: int, puzzle: Puzzle, nodes: int | None = None, seconds: float | None = None) -> SolveResult:
+    start = perf_counter()
+    budget = Budget.of(nodes, seconds) if nodes is not None or seconds is not None else None
+    result = search_paths(puzzle.board, budget)
+    expected = None
+    if puzzle.solution is not None:
+        expected = any(path.points == puzzle.solution.points for path in result.paths)
+    return SolveResult(index, result.paths, perf_counter() - start, expected, result.status)
+
+
+def solve_stream(puzzles: Iterable[Puzzle], workers: int | None = None, max_pending: int | None = None,
+                 nodes: int | None = None, seconds: float | None = None) -> Generator[SolveResult, None, None]:
+    """
+    Solves `puzzles` on a pool of `workers` processes, yielding each result as soon as it is ready.
+    At most `max_pending` puzzles (by default two per worker) are taken from `puzzles` before their results
+    are yielded, so a lazy input is read only as fast as the pool keeps up.
+    Each puzzle gets at most `nodes` search nodes and `seconds` of solving, so one hard puzzle cannot hold
+    a worker for long; its result then has the paths found so far and the status of the limit it hit.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending: set[Future] = set()
+        for index, puzzle in enumerate(puzzles):
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(executor.submit(solve_task, index, puzzle, nodes, seconds))
+        for future in as_completed(pending):
+            yield future.result()
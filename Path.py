@@ -1,52 +1,274 @@
+from dataclasses import dataclass, field
+from itertools import islice
+
+from Budget import Budget, BudgetExceeded, SearchStatus, within
 from NoRepr import no_repr
-from Position import Coordinate, SegmentPos
-from multipledispatch import dispatch
-from typing import TYPE_CHECKING, Self
+from Position import Coordinate, SegmentPos, segment_between
+from SolveCache import SolveCache, Solutions, solve_cache
+from Stats import stats
+from typing import TYPE_CHECKING, Self, Generator
 
 if TYPE_CHECKING:
     from Board import Board
+    from Region import Regions
 
 @no_repr
 class Path:
-    points: list[Coordinate]
-    goal: Coordinate
+    """
+    A path as a chain of nodes, each holding its last point and the path before it, so `path + point` takes
+    constant time and the paths of a search share their prefixes.
+    The point list, the segment list and the point and segment sets are built on first use and kept. The search
+    does not build them for the prefixes it goes through, but keeps the sets of the one it extends in a `Trail`.
+    """
+    __slots__ = ('parent', 'head', 'goal', 'length', '_points', '_segments', '_point_set', '_segment_set')
+
+    def __init__(self, points: list[Coordinate] | Coordinate, goal: Coordinate):
+        """Either the points of the path so far, or just its start point."""
+        if isinstance(points, Coordinate):
+            points = [points]
+        parent = None
+        for point in points[:-1]:
+            parent = Path.node(parent, point, goal)
+        self.set_node(parent, points[-1], goal)
+        self._points = list(points)
+
+    @staticmethod
+    def node(parent: 'Path | None', head: Coordinate, goal: Coordinate) -> 'Path':
+        path = object.__new__(Path)
+        path.set_node(parent, head, goal)
+        return path
+
+    def set_node(self, parent: 'Path | None', head: Coordinate, goal: Coordinate) -> None:
+        self.parent = parent
+        self.head = head
+        self.goal = goal
+        self.length = 1 if parent is None else parent.length + 1
+        self._points: list[Coordinate] | None = None
+        self._segments: list[SegmentPos] | None = None
+        self._point_set: frozenset[Coordinate] | None = None
+        self._segment_set: frozenset[SegmentPos] | None = None
+
+    @property
+    def points(self) -> list[Coordinate]:
+        """Must not be edited, as it is shared by every later use."""
+        if self._points is None:
+            points: list[Coordinate] = []
+            node = self
+            while node is not None:
+                points.append(node.head)
+                node = node.parent
+            points.reverse()
+            self._points = points
+        return self._points
 
     @property
     def segments(self) -> list[SegmentPos]:
-        return [SegmentPos.between(p, q) for p, q in zip(self.points[:-1], self.points[1:])]
+        if self._segments is None:
+            self._segments = [segment_between(p, q) for p, q in zip(self.points[:-1], self.points[1:])]
+        return self._segments
 
-    @dispatch(Coordinate, Coordinate)
-    def __init__(self, start: Coordinate, goal: Coordinate):
-        self.__init__([start], goal)
+    @property
+    def point_set(self) -> frozenset[Coordinate]:
+        if self._point_set is None:
+            self._point_set = frozenset(self.points)
+        return self._point_set
 
-    @dispatch(list, Coordinate)
-    def __init__(self, points: list[Coordinate], goal: Coordinate):
-        self.points = points
-        self.goal = goal
+    @property
+    def segment_set(self) -> frozenset[SegmentPos]:
+        if self._segment_set is None:
+            self._segment_set = frozenset(self.segments)
+        return self._segment_set
 
     def __str__(self) -> str:
         points_str: str = '->'.join(map(str, self.points))
-        if self.points[-1] == self.goal:
+        if self.head == self.goal:
             return points_str
         return points_str + '->...->' + str(self.goal)
 
     def __add__(self, point: Coordinate) -> Self:
-        return Path(self.points + [point], self.goal)
+        return Path.node(self, point, self.goal)
 
+    def __reduce__(self):
+        return Path, (self.points, self.goal)
 
-def find_paths(board: 'Board') -> list[Path]:
-    goal: Coordinate = board.end_point
-    paths: list[Path] = []
 
-    def finder(current: Path) -> None:
-        last: Coordinate = current.points[-1]
-        if last == goal:
-            if board.check(current):
-                paths.append(current)
+class Trail:
+    """
+    The points and segments of the path a depth-first search is extending, in mutable sets that the search
+    updates as it goes down (`enter`) and back (`leave`), so that no set is built for each path it goes through.
+    """
+
+    def __init__(self, path: Path | None = None):
+        """The trail of `path`, or an empty one."""
+        self.points: set[Coordinate] = set() if path is None else set(path.points)
+        self.segments: set[SegmentPos] = set() if path is None else set(path.segments)
+
+    def enter(self, path: Path) -> None:
+        """Adds the last step of `path`, whose prefix must be what the trail holds."""
+        self.points.add(path.head)
+        if path.parent is not None:
+            self.segments.add(segment_between(path.parent.head, path.head))
+
+    def leave(self, path: Path) -> None:
+        """Takes back the `enter` of `path`."""
+        self.points.discard(path.head)
+        if path.parent is not None:
+            self.segments.discard(segment_between(path.parent.head, path.head))
+
+
+@dataclass
+class PartialPath:
+    """
+    A path prefix during search, with the points its remaining part can still visit.
+    `trail` holds the points and segments of `path` only until the search moves on, so it must not be kept.
+    """
+    path: Path
+    reachable: set[Coordinate]
+    trail: Trail
+    regions: 'Regions | None' = field(default=None, init=False)  # Filled in once a sealed region is checked
+    sealed: dict[Coordinate, bool] = field(default_factory=dict, init=False)  # See `Board.is_sealed`
+
+    @property
+    def head(self) -> Coordinate:
+        return self.path.head
+
+    @property
+    def points(self) -> set[Coordinate]:
+        return self.trail.points
+
+    @property
+    def segments(self) -> set[SegmentPos]:
+        return self.trail.segments
+
+    def may_use(self, board: 'Board', segment: SegmentPos) -> bool:
+        """Whether the rest of the path might still go through `segment`."""
+        if segment in self.segments:
+            return True
+        first, second = segment.coordinate, segment.coordinate + segment.direction
+        return ((first in self.reachable or first == self.head) and (second in self.reachable or second == self.head)
+                and board.is_connected(segment))
+
+
+def extensions(board: 'Board', path: Path, prune: bool = True, trail: Trail | None = None) -> list[Path]:
+    """
+    The one-step-longer paths the search goes on with after `path`, in search order.
+    `trail`, if given, must hold `path`; it is left as it was.
+    """
+    if trail is None:
+        trail = Trail(path)
+    extended = [path + near for near in board.connected_nears(path.head) if near not in trail.points]
+    if not prune:
+        return extended
+    kept: list[Path] = []
+    for child in extended:
+        trail.enter(child)
+        if board.may_complete(child, trail):
+            kept.append(child)
+        trail.leave(child)
+    return kept
+
+
+def iter_paths(board: 'Board', *, bitboard: bool = False, prune: bool = True, check: bool = True,
+               budget: Budget | None = None) -> Generator[Path, None, None]:
+    """
+    Yields the valid paths of `board` one by one, as the search finds them.
+    `bitboard` switches to the integer-mask engine in `BitBoard`.
+    With `prune`, prefixes that can no longer satisfy the board (see `Board.may_complete`) are abandoned early.
+    Without `check`, every complete path the search reaches is yielded unchecked, e.g. for `BatchCheck`.
+    Every path the search goes through is charged to `budget`, and the search stops early once it runs out.
+    """
+    if bitboard:
+        from BitBoard import BitBoard
+        search = BitBoard(board).iter_paths(prune=prune, check=check, budget=budget)
+    else:
+        search = iter_paths_stack(board, prune, check, budget)
+    try:
+        yield from search
+    except BudgetExceeded:  # Out of a tiling, which has no partial result
+        return
+
+
+def iter_paths_stack(board: 'Board', prune: bool, check: bool,
+                     budget: Budget | None) -> Generator[Path, None, None]:
+    """
+    Depth-first search over an explicit stack: the extensions still to try of each path on the way, last first.
+    The path being extended is kept in a `Trail`, which is taken back a step whenever the search backtracks.
+    """
+    goal: Coordinate = board.end_point
+    trail = Trail()
+    paths: list[Path] = []  # The path being extended and its prefixes; the list below `paths[i]` is `pending[i + 1]`
+    pending: list[list[Path]] = [[Path(board.start_point, goal)]]
+    while len(pending) != 0:
+        if len(pending[-1]) == 0:
+            pending.pop()
+            if len(paths) != 0:
+                trail.leave(paths.pop())
+            continue
+        current = pending[-1].pop()
+        if budget is not None and not budget.spend():
             return
-        for near in board.nears(last):
-            if near not in current.points and board.is_connected(SegmentPos.between(last, near)):
-                finder(current + near)
+        if current.head == goal:
+            stats.count('find_paths.paths_checked')
+            if not check or within(budget, board.check, current):
+                yield current
+            continue
+        stats.count('find_paths.nodes')
+        trail.enter(current)
+        extended = within(budget, extensions, board, current, prune, trail)
+        if len(extended) == 0:
+            stats.count('find_paths.dead_ends')
+        paths.append(current)
+        pending.append(extended[::-1])
+
+
+@dataclass
+class SearchResult:
+    paths: list[Path]
+    status: SearchStatus = SearchStatus.Complete  # Anything else means `paths` may be missing some
+
+
+def search_paths(board: 'Board', budget: Budget | None = None, limit: int | None = None, *,
+                 bitboard: bool = False, prune: bool = True,
+                 cache: SolveCache | None = solve_cache) -> SearchResult:
+    """
+    The valid paths of `board`, or the first `limit` of them, found within `budget`.
+    Only searches that were not cut short by the budget are cached.
+    """
+    if cache is not None and (cached := cache.get(board)) is not None:
+        if cached.complete or (limit is not None and len(cached.paths) >= limit):
+            return SearchResult(cached.paths[:limit])
+    with stats.timed('find_paths'):
+        paths = list(islice(iter_paths(board, bitboard=bitboard, prune=prune, budget=budget), limit))
+    if budget is not None and budget.exceeded:
+        return SearchResult(paths, budget.status)
+    if cache is not None:
+        cache.put(board, Solutions(paths, complete=limit is None or len(paths) < limit))
+    return SearchResult(paths)
+
+
+def find_paths(board: 'Board', *, bitboard: bool = False, prune: bool = True,
+               cache: SolveCache | None = solve_cache) -> list[Path]:
+    """Every valid path of `board`; see `iter_paths`. Boards already solved are answered from `cache`."""
+    if cache is not None and (cached := cache.get(board)) is not None and cached.complete:
+        return list(cached.paths)
+    with stats.timed('find_paths'):
+        paths = list(iter_paths(board, bitboard=bitboard, prune=prune))
+    if cache is not None:
+        cache.put(board, Solutions(paths, complete=True))
+    return list(paths)
+
 
-    finder(Path(board.start_point, goal))
-    return paths
+def count_paths(board: 'Board', limit: int = 2, *, bitboard: bool = False, prune: bool = True,
+                cache: SolveCache | None = solve_cache) -> int:
+    """
+    The number of valid paths of `board`, but stops searching once `limit` of them are found.
+    With the default limit, 0, 1 and 2 mean "no solution", "unique" and "several".
+    """
+    if cache is not None and (cached := cache.get(board)) is not None:
+        if cached.complete or len(cached.paths) >= limit:
+            return min(len(cached.paths), limit)
+    with stats.timed('count_paths'):
+        paths = list(islice(iter_paths(board, bitboard=bitboard, prune=prune), max(limit, 0)))
+    if cache is not None:
+        cache.put(board, Solutions(paths, complete=len(paths) < limit))
+    return len(paths)
@@ -1,20 +1,21 @@
 from abc import ABC
-from collections.abc import Callable
+from collections.abc import Callable, Iterable
 from copy import deepcopy
 from enum import Enum, StrEnum, auto
 from dataclasses import dataclass, field
-from itertools import product
-from random import randint, choice
+from functools import cache
+from random import Random
 from typing import Self, TypeGuard
 
 from multipledispatch import dispatch
 
 from GetId import id_getter
+from Stats import stats
 from NoRepr import no_repr
 
 
 class Position(ABC):
-    ...
+    __slots__ = ()
 
 
 def is_point(pos: Position) -> TypeGuard['Coordinate']:
@@ -69,41 +70,78 @@ class CoordinateType(StrEnum):
         return CoordinateType.Unknown
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True, eq=False)
 class Coordinate(Position):
     x: int
     y: int
     type: CoordinateType = field(default_factory=CoordinateType.unknown, kw_only=True)  # Used only in generating
 
+    @staticmethod
+    def of(x: int, y: int, type: CoordinateType = CoordinateType.Unknown) -> 'Coordinate':
+        """The shared instance for this position and type, so that hot loops do not allocate coordinates."""
+        key = (x, y, type.value)
+        if (coordinate := interned_coordinates.get(key)) is None:
+            coordinate = interned_coordinates[key] = Coordinate(x, y, type=type)
+        return coordinate
+
     def __hash__(self):
         return hash((self.x, self.y))
 
+    def __eq__(self, other: object) -> bool:
+        # Shared instances are usually compared with themselves; otherwise `CoordinateType.Unknown` matches any type
+        if self is other:
+            return True
+        if not isinstance(other, Coordinate):
+            return NotImplemented
+        return self.x == other.x and self.y == other.y and self.type == other.type
+
     def __str__(self) -> str:
         return f"{self.type}({self.x}, {self.y})"
 
     def __add__(self, other: SegmentDirection | Self) -> Self:
-        return Coordinate(self.x + other.x, self.y + other.y, type=self.type)
+        return Coordinate.of(self.x + other.x, self.y + other.y, self.type)
 
     def __sub__(self, other: SegmentDirection | Self) -> Self:
-        return Coordinate(self.x - other.x, self.y - other.y, type=self.type)
+        return Coordinate.of(self.x - other.x, self.y - other.y, self.type)
 
     def __radd__(self, other: SegmentDirection | Self) -> Self:
-        return Coordinate(self.x + other.x, self.y + other.y, type=self.type)
+        return Coordinate.of(self.x + other.x, self.y + other.y, self.type)
 
     def nears(self) -> list['SegmentPos']:
-        return [SegmentPos(self, SegmentDirection.X), SegmentPos(self + SegmentDirection.Y, SegmentDirection.X),
-                SegmentPos(self, SegmentDirection.Y), SegmentPos(self + SegmentDirection.X, SegmentDirection.Y)]
+        return [SegmentPos.of(self, SegmentDirection.X), SegmentPos.of(self + SegmentDirection.Y, SegmentDirection.X),
+                SegmentPos.of(self, SegmentDirection.Y), SegmentPos.of(self + SegmentDirection.X, SegmentDirection.Y)]
 
     def near(self, other: Self):
         return abs(self.x - other.x) + abs(self.y - other.y) == 1
 
 
+interned_coordinates: dict[tuple[int, int, str], Coordinate] = {}  # See `Coordinate.of`
+
+
 @no_repr
-@dataclass(frozen=True, unsafe_hash=True)
+@dataclass(frozen=True, slots=True, eq=False)
 class SegmentPos(Position):
     coordinate: Coordinate
     direction: SegmentDirection
 
+    @staticmethod
+    def of(coordinate: Coordinate, direction: SegmentDirection) -> 'SegmentPos':
+        """The shared instance for this segment, like `Coordinate.of`."""
+        key = (coordinate.x, coordinate.y, coordinate.type.value, direction)
+        if (segment := interned_segments.get(key)) is None:
+            segment = interned_segments[key] = SegmentPos(coordinate, direction)
+        return segment
+
+    def __hash__(self):
+        return hash((self.coordinate, self.direction))
+
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, SegmentPos):
+            return NotImplemented
+        return self.direction is other.direction and self.coordinate == other.coordinate
+
     def __str__(self) -> str:
         return f'{self.coordinate} ~ {self.coordinate + self.direction}'
 
@@ -115,15 +153,25 @@ class SegmentPos(Position):
     @staticmethod
     @dispatch(Coordinate, Coordinate)
     def between(p: Coordinate, q: Coordinate) -> 'SegmentPos':
-        if p.x + 1 == q.x and p.y == q.y:
-            return SegmentPos(p, SegmentDirection.X)
-        if p.x == q.x + 1 and p.y == q.y:
-            return SegmentPos(q, SegmentDirection.X)
-        if p.x == q.x and p.y + 1 == q.y:
-            return SegmentPos(p, SegmentDirection.Y)
-        if p.x == q.x and p.y == q.y + 1:
-            return SegmentPos(q, SegmentDirection.Y)
-        raise ValueError(f'{p} and {q} are not in a segment')
+        return segment_between(p, q)
+
+
+interned_segments: dict[tuple[int, int, str, SegmentDirection], SegmentPos] = {}  # See `SegmentPos.of`
+
+
+def segment_between(p: Coordinate, q: Coordinate) -> SegmentPos:
+    """`SegmentPos.between` for two coordinates, without the dispatching; used by the search loops."""
+    if p.y == q.y:
+        if p.x + 1 == q.x:
+            return SegmentPos.of(p, SegmentDirection.X)
+        if p.x == q.x + 1:
+            return SegmentPos.of(q, SegmentDirection.X)
+    elif p.x == q.x:
+        if p.y + 1 == q.y:
+            return SegmentPos.of(p, SegmentDirection.Y)
+        if p.y == q.y + 1:
+            return SegmentPos.of(q, SegmentDirection.Y)
+    raise ValueError(f'{p} and {q} are not in a segment')
 
 
 class Rotation(Enum):
@@ -143,6 +191,61 @@ class Rotation(Enum):
         return self.translation(coordinate)
 
 
+type Cell = tuple[int, int]
+
+
+def normalise(cells: Iterable[Cell]) -> tuple[Cell, ...]:
+    """Sorted cells, translated so that their bounding box starts at (0, 0)."""
+    cells = list(cells)
+    if len(cells) == 0:
+        return ()
+    x_min = min(x for x, _ in cells)
+    y_min = min(y for _, y in cells)
+    return tuple(sorted((x - x_min, y - y_min) for x, y in cells))
+
+
+@cache
+def orientations(cells: tuple[Cell, ...]) -> tuple[tuple[Cell, ...], ...]:
+    """The distinct normalised shapes of `cells` under the rotations of `Rotation`, in that order."""
+    found: list[tuple[Cell, ...]] = []
+    current = cells
+    for _ in Rotation.values():
+        if (normalised := normalise(current)) not in found:
+            found.append(normalised)
+        current = [(y, -x) for x, y in current]  # Rotation.Rotate90
+    return tuple(found)
+
+
+@dataclass(frozen=True, order=True)
+class Polyomino:
+    """
+    Hashable canonical form of a `BoardPart`: its cells translated to the origin and,
+    if it is rotatable, the least of its rotations. Equal shapes give equal polyominoes.
+    """
+    cells: tuple[Cell, ...]
+    rotate: bool = field(default=False, kw_only=True)
+    negative: bool = field(default=False, kw_only=True)
+
+    @staticmethod
+    def of(grids: Iterable['Coordinate'], *, rotate: bool = False, negative: bool = False) -> 'Polyomino':
+        cells = normalise((grid.x, grid.y) for grid in grids)
+        if rotate and len(cells) != 0:
+            cells = min(orientations(cells))
+        return Polyomino(cells, rotate=rotate, negative=negative)
+
+    def orientations(self) -> tuple[tuple[Cell, ...], ...]:
+        """The shapes this polyomino can be placed as; an empty one can never be placed."""
+        if len(self.cells) == 0:
+            return ()
+        return orientations(self.cells) if self.rotate else (self.cells,)
+
+    def __neg__(self) -> Self:
+        return Polyomino(self.cells, rotate=self.rotate, negative=not self.negative)
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+
 @no_repr
 @dataclass
 class BoardPart:
@@ -178,6 +281,9 @@ class BoardPart:
         self.rotate = True
         return self
 
+    def polyomino(self) -> Polyomino:
+        return Polyomino.of(self.grids, rotate=self.rotate, negative=self.negative)
+
     def __str__(self):
         return ('{' + ','.join(map(str, self.grids)) + '}'
                 + ('(fixed)' if not self.rotate else '')
@@ -188,6 +294,7 @@ class BoardPart:
 
     def __neg__(self) -> Self:
         """Invert the `negative` property."""
+        stats.count('copies.deep')
         copied = deepcopy(self)
         copied.negative = not self.negative
         return copied
@@ -215,10 +322,9 @@ class BoardPart:
             return [part for rotated in self.rotations() for part in rotated & other]
         if other.rotate:
             return other & self
-        x_diffs = range(self.bound_box.x_min - other.bound_box.x_max - 1,
-                        self.bound_box.x_max - other.bound_box.x_min + 2)
-        y_diffs = range(self.bound_box.y_min - other.bound_box.y_max - 1,
-                        self.bound_box.y_max - other.bound_box.y_min + 2)
+        own, others = self.bound_box, other.bound_box
+        x_diffs = range(own.x_min - others.x_max - 1, own.x_max - others.x_min + 2)
+        y_diffs = range(own.y_min - others.y_max - 1, own.y_max - others.y_min + 2)
         return [self.union(moved) for dx in x_diffs for dy in y_diffs
                 if self.near(moved := other + Coordinate(dx, dy))
                 if len(self ^ moved) == 0]
@@ -244,30 +350,18 @@ class BoardPart:
         return [self.translate(rotation) for rotation in Rotation.values()] if self.rotate else [self]
 
     def match(self, parts: list[Self]) -> bool:
-        if self.negative:
-            return (-self).match([-part for part in parts])
-        negatives: list[BoardPart] = [part for part in parts if part.negative]
-        if len(negatives) != 0:
-            return any(added.match([part for part in parts if part != neg])
-                       for neg in negatives for added in (-neg) & self)
-        if self.rotate or any(part.rotate for part in parts):
-            return any(rotated.match(list(rotated_parts)) for rotated in self.rotations()
-                       for rotated_parts in product(*[part.rotations() for part in parts]))
-        if len(self) == len(parts) == 0:
-            return True
-        if len(self) != sum(map(len, parts)):
-            return False
-        part = parts[0]
-        return any(self.diff(part + diff).match(parts[1:]) for diff in self - part if part + diff <= self)
-
-    def split(self) -> tuple[Self, Self]:
-        if randint(0, 2) == 0:
-            negative = choice(common_parts)
-            return -negative, choice(self & negative)
+        """Whether `parts` exactly fill this part; solved as an exact cover problem in `Tiling`."""
+        from Tiling import match
+        return match(self.polyomino(), [part.polyomino() for part in parts])
+
+    def split(self, rng: Random) -> tuple[Self, Self]:
+        if rng.randint(0, 2) == 0:
+            negative = rng.choice(common_parts)
+            return -negative, rng.choice(self & negative)
         else:
             grid_sets = [set(), set()]
             for pos in self.grids:
-                grid_sets[randint(0, 1)].add(pos)
+                grid_sets[rng.randint(0, 1)].add(pos)
             return tuple(BoardPart(grids, rotate=True, negative=self.negative) for grids in grid_sets)
 
 
@@ -281,3 +375,6 @@ common_parts: list[BoardPart] = [
     BoardPart({Coordinate(0, 0), Coordinate(0, 1), Coordinate(0, 2), Coordinate(1, 0)}, rotate=True),  # ['#', '###']
     BoardPart({Coordinate(0, 0), Coordinate(0, 1), Coordinate(0, 2), Coordinate(1, 1)}, rotate=True),  # [' #', '###']
 ]
+
+for common_part in common_parts:  # Rotation tables of the parts the generator uses all the time
+    orientations(common_part.polyomino().cells)
@@ -0,0 +1,55 @@
+from collections.abc import Iterable
+from random import Random
+
+from Benchmark import build_case, KINDS
+from Board import Board
+from Path import find_paths
+from Position import Coordinate
+from Shape import Hexagon, Square, Star, Triangle, Block, Jack, Colors
+
+BLOCKS = [['#'], ['##'], ['#', '#'], ['##', '#'], ['###'], ['##', '##'], ['#', '##'], ['###', ' #']]
+
+
+def random_board(seed: int) -> Board:
+    """A small board with a few random shapes of up to four kinds and some disconnected segments, for tests."""
+    rng = Random(seed)
+    width, height = rng.choice([(2, 2), (3, 2), (2, 3), (3, 3), (3, 3), (4, 3)])
+    board = Board(width, height, Coordinate(0, 0), Coordinate(width, height))
+    kinds = rng.sample(['hexagon', 'segment', 'disconnect', 'square', 'star', 'triangle', 'block', 'jack'],
+                       rng.randint(1, 4))
+    colors = [Colors.Red, Colors.Blue, Colors.White]
+    for _ in range(rng.randint(1, 5)):
+        kind = rng.choice(kinds)
+        if kind == 'hexagon':
+            board.add_point_shape(rng.randint(0, width), rng.randint(0, height), Hexagon())
+        elif kind == 'segment':
+            board.add_segment_shape(rng.choice(board.segment_positions()), Hexagon())
+        elif kind == 'disconnect':
+            board.disconnect(rng.choice(board.segment_positions()))
+        else:
+            x, y = rng.randint(0, width - 1), rng.randint(0, height - 1)
+            if kind == 'square':
+                shape = Square(rng.choice(colors))
+            elif kind == 'star':
+                shape = Star(rng.choice(colors))
+            elif kind == 'triangle':
+                shape = Triangle(rng.randint(0, 3))
+            elif kind == 'block':
+                shape = Block.from_str(rng.choice(BLOCKS), rotate=rng.random() < 0.5, negative=rng.random() < 0.15)
+            elif board.has_jack():
+                continue
+            else:
+                shape = Jack()
+            board.add_grid_shape(x, y, shape)
+    return board
+
+
+def boards(count: int, sizes: Iterable[int] = ()) -> list[Board]:
+    """The first `count` random boards, then the benchmark case of every kind for each of `sizes`."""
+    return [random_board(seed) for seed in range(count)] + [build_case(size, kind).board
+                                                             for size in sizes for kind in KINDS]
+
+
+def solved(board: Board, **options) -> list[str]:
+    """Every valid path of `board` as text, found without the solve cache; `options` go to `find_paths`."""
+    return [str(path) for path in find_paths(board, cache=None, **options)]
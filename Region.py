@@ -0,0 +1,68 @@
+from collections import Counter
+from copy import copy
+from dataclasses import dataclass, field
+
+from Position import Coordinate, BoardPart
+from Shape import Shape, ColorType, Colored, Square, Block
+
+
+@dataclass
+class Region:
+    """One part of a board split by a path, with the shapes its grid rules look at."""
+    part: BoardPart
+    colors: Counter[ColorType] = field(default_factory=Counter)  # Of every `Colored` shape
+    square_colors: Counter[ColorType] = field(default_factory=Counter)
+    blocks: list[BoardPart] = field(default_factory=list)
+
+    def copy(self) -> 'Region':
+        return Region(self.part, copy(self.colors), copy(self.square_colors), list(self.blocks))
+
+    def remove(self, shape: Shape) -> None:
+        if isinstance(shape, Colored):
+            self.colors[shape.color] -= 1
+        if isinstance(shape, Square):
+            self.square_colors[shape.color] -= 1
+            if self.square_colors[shape.color] == 0:
+                del self.square_colors[shape.color]
+        if isinstance(shape, Block):
+            self.blocks.remove(shape.shape)
+
+
+@dataclass
+class Regions:
+    """The region labelling of a whole board for one path; built once by `Board.regions` and shared by every shape."""
+    labels: dict[Coordinate, int] = field(default_factory=dict)
+    regions: list[Region] = field(default_factory=list)
+
+    def __getitem__(self, grid: Coordinate) -> Region:
+        return self.regions[self.labels[grid]]
+
+    def add(self, part: BoardPart) -> None:
+        for grid in part.grids:
+            self.labels[grid] = len(self.regions)
+        self.regions.append(Region(part))
+
+    def without(self, removed: list[tuple[Coordinate, Shape]]) -> 'Regions':
+        """The labelling as if the given grid shapes were gone; regions they do not touch are shared."""
+        if len(removed) == 0:
+            return self
+        result = Regions(self.labels, list(self.regions))
+        for grid, shape in removed:
+            if grid in self.labels:
+                index = self.labels[grid]
+                if result.regions[index] is self.regions[index]:
+                    result.regions[index] = self.regions[index].copy()
+                result.regions[index].remove(shape)
+        return result
+
+    def add_shapes(self, grid: Coordinate, shapes: tuple[Shape, ...]) -> None:
+        if grid not in self.labels:
+            return
+        region = self[grid]
+        for shape in shapes:
+            if isinstance(shape, Colored):
+                region.colors[shape.color] += 1
+            if isinstance(shape, Square):
+                region.square_colors[shape.color] += 1
+            if isinstance(shape, Block):
+                region.blocks.append(shape.shape)
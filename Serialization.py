@@ -0,0 +1,368 @@
+import json
+from dataclasses import dataclass
+from typing import BinaryIO, Generator
+
+from Board import Board
+from Path import Path
+from Position import Coordinate, SegmentPos, SegmentDirection, CoordinateType, BoardPart
+from Shape import Shape, Hexagon, Square, Star, Triangle, Block, Jack, Colors, ColorType
+
+VERSION = 2
+MAGIC = b'TWP' + bytes([VERSION])  # Starts a packed binary file; JSON Lines files start with their header line
+SHAPE_NAMES = ['Hexagon', 'Square', 'Star', 'Triangle', 'Block', 'Jack']  # Binary tags are indices in this list
+COLORS = list(Colors)
+TYPES = [CoordinateType.Point.value, CoordinateType.Grid.value, CoordinateType.Unknown.value]  # Binary tags
+
+
+@dataclass
+class Puzzle:
+    board: Board
+    solution: Path | None = None
+
+
+def encode_color(color: ColorType) -> str:
+    return str(color)
+
+
+def decode_color(value: str) -> ColorType:
+    return Colors(value) if value in Colors._value2member_map_ else value
+
+
+def encode_shape(shape: Shape) -> list:
+    match shape:
+        case Square() | Star():
+            return [type(shape).__name__, encode_color(shape.color)]
+        case Triangle():
+            return ['Triangle', shape.count]
+        case Block():
+            return ['Block', sorted([grid.x, grid.y] for grid in shape.shape.grids),
+                    shape.shape.rotate, shape.shape.negative]
+        case Hexagon() | Jack():
+            return [type(shape).__name__]
+    raise TypeError(f'Cannot serialize {shape!r}')
+
+
+def encode_coordinate(coordinate: Coordinate) -> list:
+    """Its type is kept too: positions of different types compare equal, but some lookups tell them apart."""
+    return [coordinate.x, coordinate.y, coordinate.type.value]
+
+
+def decode_coordinate(value: list) -> Coordinate:
+    x, y, type = value
+    return Coordinate.of(x, y, CoordinateType(type))
+
+
+def decode_shape(value: list) -> Shape:
+    match value:
+        case ['Hexagon']:
+            return Hexagon()
+        case ['Square', color]:
+            return Square(decode_color(color))
+        case ['Star', color]:
+            return Star(decode_color(color))
+        case ['Triangle', count]:
+            return Triangle(count)
+        case ['Block', cells, rotate, negative]:
+            return Block(BoardPart({Coordinate(x, y) for x, y in cells}, rotate=rotate, negative=negative))
+        case ['Jack']:
+            return Jack()
+    raise ValueError(f'Unknown shape {value!r}')
+
+
+def encode_puzzle(puzzle: Puzzle) -> dict:
+    """Plain values for one puzzle; only the board objects that differ from the default are kept."""
+    board = puzzle.board
+    return {
+        'size': [board.width, board.height],
+        'start': encode_coordinate(board.start_point),
+        'end': encode_coordinate(board.end_point),
+        'points': [[pos.x, pos.y, [encode_shape(shape) for shape in point.shapes]]
+                   for pos, point in board.points.items() if not point.is_default()],
+        'segments': [[*encode_coordinate(pos.coordinate), str(pos.direction), segment.connected,
+                      [encode_shape(shape) for shape in segment.shapes]]
+                     for pos, segment in board.segments.items() if not segment.is_default()],
+        'grids': [[pos.x, pos.y, [encode_shape(shape) for shape in grid.shapes]]
+                  for pos, grid in board.grids.items() if not grid.is_default()],
+        'solution': None if puzzle.solution is None else [[point.x, point.y] for point in puzzle.solution.points],
+    }
+
+
+def decode_puzzle(value: dict) -> Puzzle:
+    width, height = value['size']
+    board = Board(width, height, decode_coordinate(value['start']), decode_coordinate(value['end']))
+    for x, y, shapes in value['points']:
+        for shape in shapes:
+            board.add_point_shape(x, y, decode_shape(shape))
+    for x, y, type, direction, connected, shapes in value['segments']:
+        pos = SegmentPos.of(decode_coordinate([x, y, type]), SegmentDirection[direction])
+        if not connected:
+            board.disconnect(pos)
+        for shape in shapes:
+            board.add_segment_shape(pos, decode_shape(shape))
+    for x, y, shapes in value['grids']:
+        for shape in shapes:
+            board.add_grid_shape(x, y, decode_shape(shape))
+    solution = None
+    if value['solution'] is not None:
+        solution = Path([Coordinate(x, y) for x, y in value['solution']], board.end_point)
+    return Puzzle(board, solution)
+
+
+class Packer:
+    """Builds one binary record. Integers are LEB128 varints, zigzagged where they may be negative."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def uint(self, value: int) -> None:
+        while value >= 0x80:
+            self.data.append(value & 0x7f | 0x80)
+            value >>= 7
+        self.data.append(value)
+
+    def int(self, value: int) -> None:
+        self.uint(value << 1 if value >= 0 else (-value << 1) - 1)
+
+    def text(self, value: str) -> None:
+        encoded = value.encode()
+        self.uint(len(encoded))
+        self.data += encoded
+
+    def color(self, color: ColorType) -> None:
+        if color in COLORS:
+            self.uint(COLORS.index(color) + 1)
+        else:
+            self.uint(0)
+            self.text(str(color))
+
+    def shapes(self, shapes: list[list]) -> None:
+        self.uint(len(shapes))
+        for shape in shapes:
+            self.uint(SHAPE_NAMES.index(shape[0]))
+            match shape:
+                case ['Square' | 'Star', color]:
+                    self.color(decode_color(color))
+                case ['Triangle', count]:
+                    self.uint(count)
+                case ['Block', cells, rotate, negative]:
+                    self.uint(rotate | negative << 1)
+                    self.uint(len(cells))
+                    for x, y in cells:
+                        self.int(x)
+                        self.int(y)
+
+    def coordinate_type(self, type: str) -> None:
+        self.uint(TYPES.index(type))
+
+    def puzzle(self, value: dict) -> bytes:
+        for number in value['size'] + value['start'][:2] + value['end'][:2]:
+            self.uint(number)
+        self.coordinate_type(value['start'][2])
+        self.coordinate_type(value['end'][2])
+        self.uint(len(value['points']))
+        for x, y, shapes in value['points']:
+            self.uint(x)
+            self.uint(y)
+            self.shapes(shapes)
+        self.uint(len(value['segments']))
+        for x, y, type, direction, connected, shapes in value['segments']:
+            self.uint(x)
+            self.uint(y)
+            self.uint((direction == 'Y') | connected << 1 | TYPES.index(type) << 2)
+            self.shapes(shapes)
+        self.uint(len(value['grids']))
+        for x, y, shapes in value['grids']:
+            self.uint(x)
+            self.uint(y)
+            self.shapes(shapes)
+        solution = value['solution']
+        self.uint(0 if solution is None else len(solution) + 1)
+        for x, y in solution or []:
+            self.uint(x)
+            self.uint(y)
+        return bytes(self.data)
+
+
+class Unpacker:
+    """Reads what `Packer` built back into the plain values of `encode_puzzle`."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.offset = 0
+
+    def uint(self) -> int:
+        value, shift = 0, 0
+        while True:
+            byte = self.data[self.offset]
+            self.offset += 1
+            value |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    def int(self) -> int:
+        value = self.uint()
+        return value >> 1 if value & 1 == 0 else -((value + 1) >> 1)
+
+    def text(self) -> str:
+        length = self.uint()
+        self.offset += length
+        return self.data[self.offset - length:self.offset].decode()
+
+    def color(self) -> str:
+        index = self.uint()
+        return encode_color(COLORS[index - 1]) if index != 0 else self.text()
+
+    def shapes(self) -> list[list]:
+        shapes: list[list] = []
+        for _ in range(self.uint()):
+            name = SHAPE_NAMES[self.uint()]
+            if name in ('Square', 'Star'):
+                shapes.append([name, self.color()])
+            elif name == 'Triangle':
+                shapes.append([name, self.uint()])
+            elif name == 'Block':
+                flags = self.uint()
+                cells = [[self.int(), self.int()] for _ in range(self.uint())]
+                shapes.append([name, cells, bool(flags & 1), bool(flags & 2)])
+            else:
+                shapes.append([name])
+        return shapes
+
+    def puzzle(self) -> dict:
+        width, height, start_x, start_y, end_x, end_y, start_type, end_type = (self.uint() for _ in range(8))
+        points = [[self.uint(), self.uint(), self.shapes()] for _ in range(self.uint())]
+        segments = []
+        for _ in range(self.uint()):
+            x, y, flags = self.uint(), self.uint(), self.uint()
+            segments.append([x, y, TYPES[flags >> 2], 'Y' if flags & 1 else 'X', bool(flags & 2), self.shapes()])
+        grids = [[self.uint(), self.uint(), self.shapes()] for _ in range(self.uint())]
+        length = self.uint()
+        solution = None if length == 0 else [[self.uint(), self.uint()] for _ in range(length - 1)]
+        return {'size': [width, height], 'start': [start_x, start_y, TYPES[start_type]],
+                'end': [end_x, end_y, TYPES[end_type]],
+                'points': points, 'segments': segments, 'grids': grids, 'solution': solution}
+
+
+def read_uint(file: BinaryIO) -> int | None:
+    """A varint read straight from `file`, or None at the end of it."""
+    value, shift = 0, 0
+    while len(byte := file.read(1)) != 0:
+        value |= (byte[0] & 0x7f) << shift
+        if byte[0] < 0x80:
+            return value
+        shift += 7
+    if shift != 0:
+        raise ValueError('Truncated record length')
+    return None
+
+
+class PuzzleWriter:
+    """
+    Appends puzzles to a file one at a time, so memory stays constant however many are written.
+    JSON Lines by default (a header line, then one puzzle per line); with `binary`, `MAGIC` and then
+    length-prefixed packed records.
+    """
+
+    def __init__(self, file: BinaryIO | str, binary: bool = False):
+        self.owned = isinstance(file, str)
+        self.file: BinaryIO = open(file, 'wb') if isinstance(file, str) else file
+        self.binary = binary
+        self.count = 0
+        if binary:
+            self.file.write(MAGIC)
+        else:
+            self.file.write(json.dumps({'format': 'witness-puzzles', 'version': VERSION}).encode() + b'\n')
+
+    def write(self, board: Board, solution: Path | None = None) -> None:
+        value = encode_puzzle(Puzzle(board, solution))
+        if self.binary:
+            record = Packer().puzzle(value)
+            length = Packer()
+            length.uint(len(record))
+            self.file.write(bytes(length.data) + record)
+        else:
+            self.file.write(json.dumps(value, separators=(',', ':')).encode() + b'\n')
+        self.count += 1
+
+    def close(self) -> None:
+        if self.owned:
+            self.file.close()
+        else:
+            self.file.flush()
+
+    def __enter__(self) -> 'PuzzleWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class PuzzleReader:
+    """
+    Reads a file of either format lazily: iterating decodes one puzzle at a time, and `offsets` finds where
+    each record starts without decoding any, for `read_at`. Works on pipes too, except for `offsets` and `read_at`.
+    """
+
+    def __init__(self, file: BinaryIO | str):
+        self.owned = isinstance(file, str)
+        self.file: BinaryIO = open(file, 'rb') if isinstance(file, str) else file
+        head = self.file.read(len(MAGIC))
+        if head[:3] == MAGIC[:3]:
+            self.binary = True
+            version = head[3]
+        else:
+            self.binary = False
+            version = json.loads(head + self.file.readline()).get('version')
+        if version != VERSION:
+            raise ValueError(f'Unsupported puzzle file version {version}')
+        self.start = self.file.tell() if self.file.seekable() else None
+
+    def raw(self) -> Generator[bytes, None, None]:
+        """Each record as stored, undecoded."""
+        if self.binary:
+            while (length := read_uint(self.file)) is not None:
+                yield self.file.read(length)
+        else:
+            for line in self.file:
+                if line.strip():
+                    yield line
+
+    def decode(self, record: bytes) -> Puzzle:
+        return decode_puzzle(Unpacker(record).puzzle() if self.binary else json.loads(record))
+
+    def __iter__(self) -> Generator[Puzzle, None, None]:
+        for record in self.raw():
+            yield self.decode(record)
+
+    def offsets(self) -> list[int]:
+        """Where every record starts, from a scan that skips over their contents."""
+        self.file.seek(self.start)
+        offsets: list[int] = []
+        while True:
+            offset = self.file.tell()
+            if self.binary:
+                if (length := read_uint(self.file)) is None:
+                    break
+                self.file.seek(length, 1)
+            elif len(line := self.file.readline()) == 0:
+                break
+            elif not line.strip():
+                continue
+            offsets.append(offset)
+        self.file.seek(self.start)
+        return offsets
+
+    def read_at(self, offset: int) -> Puzzle:
+        self.file.seek(offset)
+        return next(iter(self))
+
+    def close(self) -> None:
+        if self.owned:
+            self.file.close()
+
+    def __enter__(self) -> 'PuzzleReader':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
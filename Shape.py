@@ -1,21 +1,43 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from enum import StrEnum, auto
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, ClassVar
 
 from NoRepr import no_repr
 from Position import Position, Coordinate
-from Path import Path
+from Path import Path, PartialPath
 
 if TYPE_CHECKING:
     from Board import Board, BoardPart
+    from Region import Regions
 
 
 class Shape(ABC):
+    cost: ClassVar[int] = 1  # Rough price of `check`; `Board.check` runs cheaper shapes first
+
     @abstractmethod
-    def check(self, board: 'Board', pos: Position, path: Path) -> bool:
+    def check(self, board: 'Board', pos: Position, path: Path, regions: 'Regions') -> bool:
         ...
 
+    def may_pass(self, board: 'Board', pos: Position, partial: PartialPath) -> bool:
+        """Whether `check` might still pass once `partial` is completed; only ever a necessary condition."""
+        return True
+
+    def key(self) -> tuple:
+        """What tells this shape apart from other shapes, in plain values; used by `Board.fingerprint`."""
+        return type(self).__name__,
+
+
+class RegionShape(Shape, ABC):
+    """A grid shape whose rule only depends on the region containing it."""
+
+    def may_pass(self, board: 'Board', pos: Position, partial: PartialPath) -> bool:
+        if isinstance(pos, Coordinate) and board.is_sealed(pos, partial):
+            if partial.regions is None:
+                partial.regions = board.regions_along(partial.segments)
+            return self.check(board, pos, partial.path, partial.regions)
+        return True
+
 
 @no_repr
 class Colors(StrEnum):
@@ -39,30 +61,40 @@ class Colored:
 
 @no_repr
 class Hexagon(Shape):
-    def check(self, board: 'Board', pos: Position, path: Path) -> bool:
+    cost = 0
+
+    def check(self, board: 'Board', pos: Position, path: Path, regions: 'Regions') -> bool:
+        if isinstance(pos, Coordinate):
+            return pos in path.point_set
+        else:
+            return pos in path.segment_set
+
+    def may_pass(self, board: 'Board', pos: Position, partial: PartialPath) -> bool:
         if isinstance(pos, Coordinate):
-            return pos in path.points
+            return pos in partial.reachable or pos in partial.points
         else:
-            return pos in path.segments
+            return partial.may_use(board, pos)
 
     def __str__(self) -> str:
         return 'Hexagon'
 
 
 @dataclass
-class Square(Shape, Colored):
-    def check(self, board: 'Board', pos: Position, path: Path) -> bool:
+class Square(RegionShape, Colored):
+    def check(self, board: 'Board', pos: Position, path: Path, regions: 'Regions') -> bool:
         if isinstance(pos, Coordinate):
-            part: 'BoardPart' = board.find_including_part(pos, path)
-            return all(square.color == self.color for grid in part.grids
-                       for square in board.grids[grid].shapes if isinstance(square, Square))
+            return all(color == self.color for color in regions[pos].square_colors)
         else:
             return False
 
+    def key(self) -> tuple:
+        return type(self).__name__, str(self.color)
+
 
 @dataclass
-class Block(Shape):
+class Block(RegionShape):
     shape: 'BoardPart'
+    cost = 2  # Tiling
 
     @staticmethod
     def from_str(rows: list[str], *, rotate: bool = False, negative: bool = False) -> 'Block':
@@ -71,41 +103,58 @@ class Block(Shape):
         return Block(BoardPart({Coordinate(-row, column) for row, s in enumerate(rows)
                                 for column, c in enumerate(s) if c != ' '}, rotate=rotate, negative=negative))
 
-    def check(self, board: 'Board', pos: Position, path: Path) -> bool:
+    def check(self, board: 'Board', pos: Position, path: Path, regions: 'Regions') -> bool:
         if isinstance(pos, Coordinate):
-            part: 'BoardPart' = board.find_including_part(pos, path)
-            parts: list['BoardPart'] = [block.shape for grid in part.grids
-                                        for block in board.grids[grid].shapes if isinstance(block, Block)]
-            return part.match(parts)
+            region = regions[pos]
+            return region.part.match(region.blocks)
         else:
             return False
 
+    def key(self) -> tuple:
+        polyomino = self.shape.polyomino()
+        return type(self).__name__, polyomino.cells, polyomino.rotate, polyomino.negative
+
 
 @dataclass
-class Star(Shape, Colored):
-    def check(self, board: 'Board', pos: Position, path: Path) -> bool:
+class Star(RegionShape, Colored):
+    def check(self, board: 'Board', pos: Position, path: Path, regions: 'Regions') -> bool:
         if isinstance(pos, Coordinate):
-            part: 'BoardPart' = board.find_including_part(pos, path)
-            return sum(colored.color == self.color for grid in part.grids
-                       for colored in board.grids[grid].shapes if isinstance(colored, Colored)) == 2
+            return regions[pos].colors[self.color] == 2
         else:
             return False
 
+    def key(self) -> tuple:
+        return type(self).__name__, str(self.color)
+
 
 @dataclass
 class Triangle(Shape):
     count: int
+    cost = 0
 
-    def check(self, board: 'Board', pos: Position, path: Path) -> bool:
+    def check(self, board: 'Board', pos: Position, path: Path, regions: 'Regions') -> bool:
         if isinstance(pos, Coordinate):
             return board.get_segment_count(pos, path) == self.count
         else:
             return False
 
+    def may_pass(self, board: 'Board', pos: Position, partial: PartialPath) -> bool:
+        if isinstance(pos, Coordinate):
+            used = sum(side in partial.segments for side in pos.nears())
+            possible = sum(partial.may_use(board, side) for side in pos.nears())
+            return used <= self.count <= possible
+        else:
+            return False
+
+    def key(self) -> tuple:
+        return type(self).__name__, self.count
+
 
 @no_repr
 class Jack(Shape):
-    def check(self, board: 'Board', pos: Position, path: Path) -> bool:
+    cost = 0
+
+    def check(self, board: 'Board', pos: Position, path: Path, regions: 'Regions') -> bool:
         return True  # Its checking is implement in Board
 
     def __str__(self) -> str:
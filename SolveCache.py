@@ -0,0 +1,46 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from Board import Board
+    from Path import Path
+
+
+@dataclass
+class Solutions:
+    paths: list['Path']
+    complete: bool  # False if the search stopped early, so the board may have more paths
+
+
+class SolveCache:
+    """Bounded LRU cache from `Board.fingerprint` to the valid paths found on that board."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.entries: OrderedDict[int, Solutions] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, board: 'Board') -> Solutions | None:
+        key = board.fingerprint()
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, board: 'Board', solutions: Solutions) -> None:
+        key = board.fingerprint()
+        self.entries[key] = solutions
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.hits = self.misses = 0
+
+
+solve_cache = SolveCache()  # Consulted by `find_paths` and `count_paths` unless they are given another cache
@@ -0,0 +1,118 @@
+import json
+from collections import Counter
+from contextlib import nullcontext, AbstractContextManager
+from dataclasses import dataclass, asdict
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from Board import Board
+    from Path import Path
+    from Position import Position
+    from Region import Regions
+    from Shape import Shape
+
+
+@dataclass
+class ShapeStats:
+    calls: int = 0
+    failures: int = 0
+    seconds: float = 0.0
+
+
+class Frame:
+    """One timed block of `Stats.timed`; its own time is what is left after its inner frames."""
+
+    def __init__(self, stats: 'Stats', name: str):
+        self.stats = stats
+        self.name = name
+        self.start = 0.0
+        self.inner = 0.0
+
+    def __enter__(self) -> 'Frame':
+        self.stats.frames.append(self)
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        elapsed = perf_counter() - self.start
+        stack = ';'.join(frame.name for frame in self.stats.frames)
+        self.stats.frames.pop()
+        self.stats.stacks[stack] += elapsed - self.inner
+        if len(self.stats.frames) != 0:
+            self.stats.frames[-1].inner += elapsed
+
+
+class Stats:
+    """
+    Opt-in counters and timings of what the solver and the generator do. Nothing is recorded until `enabled` is set.
+    Counter names are dotted, e.g. `find_paths.nodes`; `report` gives everything as plain values and `collapsed`
+    gives the timed blocks in the collapsed-stack format flame graph tools read.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.shapes: dict[str, ShapeStats] = {}  # By shape type name
+        self.counters: Counter[str] = Counter()
+        self.maxima: dict[str, int] = {}
+        self.stacks: Counter[str] = Counter()  # Own seconds by `;`-joined stack of `timed` names
+        self.frames: list[Frame] = []
+
+    def count(self, name: str, amount: int = 1) -> None:
+        if self.enabled:
+            self.counters[name] += amount
+
+    def record_max(self, name: str, value: int) -> None:
+        if self.enabled and value > self.maxima.get(name, value - 1):
+            self.maxima[name] = value
+
+    def timed(self, name: str) -> AbstractContextManager:
+        """Times the block as frame `name`, inside whichever timed blocks are open around it."""
+        return Frame(self, name) if self.enabled else nullcontext()
+
+    def record_check(self, shape: 'Shape', passed: bool, seconds: float) -> None:
+        entry = self.shapes.setdefault(type(shape).__name__, ShapeStats())
+        entry.calls += 1
+        entry.failures += not passed
+        entry.seconds += seconds
+
+    def shape_report(self) -> dict[str, dict]:
+        """Per shape type, slowest in total first."""
+        return {name: asdict(entry)
+                for name, entry in sorted(self.shapes.items(), key=lambda item: -item[1].seconds)}
+
+    def report(self) -> dict:
+        calls = self.counters['check.calls']
+        return {
+            'counters': dict(sorted(self.counters.items())),
+            'maxima': dict(sorted(self.maxima.items())),
+            'check_pass_rate': self.counters['check.passed'] / calls if calls != 0 else None,
+            'shapes': self.shape_report(),
+            'seconds': {stack: seconds for stack, seconds in self.stacks.most_common()},
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.report(), indent=2)
+
+    def collapsed(self) -> str:
+        """One `frame;frame;frame microseconds` line per stack, as read by flamegraph.pl and speedscope."""
+        return '\n'.join(f'{stack} {round(seconds * 1e6)}' for stack, seconds in sorted(self.stacks.items()))
+
+    def clear(self) -> None:
+        self.shapes.clear()
+        self.counters.clear()
+        self.maxima.clear()
+        self.stacks.clear()
+
+
+stats = Stats()
+
+
+def check_shape(shape: 'Shape', board: 'Board', pos: 'Position', path: 'Path', regions: 'Regions') -> bool:
+    """`shape.check`, counted in `stats` when it is enabled."""
+    if not stats.enabled:
+        return shape.check(board, pos, path, regions)
+    start = perf_counter()
+    passed = shape.check(board, pos, path, regions)
+    stats.record_check(shape, passed, perf_counter() - start)
+    return passed
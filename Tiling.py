@@ -0,0 +1,231 @@
+from functools import lru_cache
+
+from Budget import active_budget
+from Position import Cell, Polyomino
+from Stats import stats
+
+
+class DancingLinks:
+    """Knuth's Algorithm X over a sparse 0/1 matrix, with every column primary."""
+
+    def __init__(self, column_count: int, rows: list[list[int]]):
+        # Node 0 is the root and nodes 1..column_count are the column headers
+        header_count = column_count + 1
+        self.left: list[int] = [(i - 1) % header_count for i in range(header_count)]
+        self.right: list[int] = [(i + 1) % header_count for i in range(header_count)]
+        self.up: list[int] = list(range(header_count))
+        self.down: list[int] = list(range(header_count))
+        self.column: list[int] = list(range(header_count))
+        self.row: list[int] = [-1] * header_count
+        self.size: list[int] = [0] * header_count
+        for index, columns in enumerate(rows):
+            first = len(self.left)
+            for offset, column in enumerate(columns):
+                node = first + offset
+                header = column + 1
+                self.left.append(node - 1 if offset != 0 else first + len(columns) - 1)
+                self.right.append(node + 1 if offset != len(columns) - 1 else first)
+                self.up.append(self.up[header])
+                self.down.append(header)
+                self.down[self.up[header]] = node
+                self.up[header] = node
+                self.column.append(header)
+                self.row.append(index)
+                self.size[header] += 1
+
+    def cover(self, header: int) -> None:
+        self.right[self.left[header]] = self.right[header]
+        self.left[self.right[header]] = self.left[header]
+        i = self.down[header]
+        while i != header:
+            j = self.right[i]
+            while j != i:
+                self.down[self.up[j]] = self.down[j]
+                self.up[self.down[j]] = self.up[j]
+                self.size[self.column[j]] -= 1
+                j = self.right[j]
+            i = self.down[i]
+
+    def uncover(self, header: int) -> None:
+        i = self.up[header]
+        while i != header:
+            j = self.left[i]
+            while j != i:
+                self.size[self.column[j]] += 1
+                self.down[self.up[j]] = j
+                self.up[self.down[j]] = j
+                j = self.left[j]
+            i = self.up[i]
+        self.right[self.left[header]] = header
+        self.left[self.right[header]] = header
+
+    def smallest_column(self) -> int:
+        header, best = 0, -1
+        j = self.right[0]
+        while j != 0:
+            if best == -1 or self.size[j] < best:
+                header, best = j, self.size[j]
+            j = self.right[j]
+        return header
+
+    def select(self, i: int) -> None:
+        """Covers the other columns of the row of node `i`."""
+        j = self.right[i]
+        while j != i:
+            self.cover(self.column[j])
+            j = self.right[j]
+
+    def deselect(self, i: int) -> None:
+        j = self.left[i]
+        while j != i:
+            self.uncover(self.column[j])
+            j = self.left[j]
+
+    def solve(self) -> list[int] | None:
+        """
+        Indices of rows covering every column exactly once, or None if there is no such set.
+        The search keeps the column and the row node it is trying on each level in `levels` instead of recursing,
+        and charges every node to the `active_budget`, if any.
+        """
+        budget = active_budget.get()
+        solution: list[int] = []
+        levels: list[list[int]] = []
+        while True:
+            stats.record_max('match.depth', len(solution))
+            if budget is not None:
+                budget.charge()
+            if self.right[0] == 0:
+                return solution
+            header = self.smallest_column()
+            if self.size[header] != 0:
+                self.cover(header)
+                levels.append([header, self.down[header]])
+            else:
+                # Back to the deepest level with rows left, and on to its next row
+                while len(levels) != 0:
+                    level = levels[-1]
+                    self.deselect(level[1])
+                    solution.pop()
+                    level[1] = self.down[level[1]]
+                    if level[1] != level[0]:
+                        break
+                    levels.pop()
+                    self.uncover(level[0])
+                else:
+                    return None
+            solution.append(self.row[levels[-1][1]])
+            self.select(levels[-1][1])
+
+
+def imbalance(cells: frozenset[Cell]) -> int:
+    """Difference between the counts of dark and light cells of a checkerboard colouring."""
+    return sum(1 if (x + y) % 2 == 0 else -1 for x, y in cells)
+
+
+def bound_size(cells: frozenset[Cell]) -> tuple[int, int]:
+    return (max(x for x, _ in cells) - min(x for x, _ in cells) + 1,
+            max(y for _, y in cells) - min(y for _, y in cells) + 1)
+
+
+def fits(cells: frozenset[Cell], width: int, height: int) -> bool:
+    cells_width, cells_height = bound_size(cells)
+    return cells_width <= width and cells_height <= height
+
+
+def add_negatives(region: frozenset[Cell], negatives: list[list[frozenset[Cell]]]) -> set[frozenset[Cell]]:
+    """
+    Every region obtained by putting each negative piece outside `region`, next to the cells placed so far.
+    The positive pieces then have to tile the grown region.
+    """
+    results: set[frozenset[Cell]] = set()
+    seen: set[tuple[frozenset[Cell], frozenset[int]]] = set()
+
+    def placements(cells: frozenset[Cell], shapes: list[frozenset[Cell]]) -> set[frozenset[Cell]]:
+        found: set[frozenset[Cell]] = set()
+        outside = {(x + dx, y + dy) for x, y in cells for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1))} - cells
+        for shape in shapes:
+            for nx, ny in outside:
+                for px, py in shape:
+                    moved = frozenset((x + nx - px, y + ny - py) for x, y in shape)
+                    if moved.isdisjoint(cells):
+                        found.add(moved)
+        return found
+
+    stack: list[tuple[frozenset[Cell], frozenset[int]]] = [(region, frozenset(range(len(negatives))))]
+    while len(stack) != 0:
+        cells, remaining = stack.pop()
+        if (cells, remaining) in seen:
+            continue
+        seen.add((cells, remaining))
+        if len(remaining) == 0:
+            results.add(cells)
+            continue
+        for index in remaining:
+            for moved in placements(cells, negatives[index]):
+                stack.append((cells | moved, remaining - {index}))
+    return results
+
+
+def tile(region: frozenset[Cell], pieces: list[list[frozenset[Cell]]]) -> bool:
+    """Whether each piece, in one of its orientations, can be placed so that together they cover `region` exactly."""
+    if len(pieces) == 0:
+        return len(region) == 0
+    if any(len(shapes) == 0 for shapes in pieces) or len(region) != sum(len(shapes[0]) for shapes in pieces):
+        return False
+    # Cheap filters before the search: every piece must fit in the bounding box, and the checkerboard
+    # imbalances of the pieces (each counted with either sign, depending on where it goes) must add up
+    width, height = bound_size(region)
+    pieces = [[shape for shape in shapes if fits(shape, width, height)] for shapes in pieces]
+    if any(len(shapes) == 0 for shapes in pieces):
+        return False
+    sums: set[int] = {0}
+    for shapes in pieces:
+        difference = abs(imbalance(shapes[0]))
+        sums = {total + sign * difference for total in sums for sign in (1, -1)}
+    if imbalance(region) not in sums:
+        return False
+
+    cells: list[Cell] = sorted(region)
+    index: dict[Cell, int] = {cell: i for i, cell in enumerate(cells)}
+    rows: list[list[int]] = []
+    for piece, shapes in enumerate(pieces):
+        placed: set[frozenset[Cell]] = set()
+        for shape in shapes:
+            px, py = min(shape)
+            for x, y in cells:
+                moved = frozenset((sx + x - px, sy + y - py) for sx, sy in shape)
+                if moved <= region and moved not in placed:
+                    placed.add(moved)
+                    rows.append([index[cell] for cell in moved] + [len(cells) + piece])
+    return DancingLinks(len(cells) + len(pieces), rows).solve() is not None
+
+
+def match(region: Polyomino, parts: list[Polyomino]) -> bool:
+    """
+    Exact-cover version of `BoardPart.match`. Negative parts are placed outside the region, each next to what is
+    already placed, and then the positive parts must tile the result; fixed and rotatable parts are honoured.
+    Results are cached by the canonical region and the multiset of canonical parts.
+    """
+    stats.count('match.calls')
+    with stats.timed('match'):
+        return cached_match(region, tuple(sorted(parts)))
+
+
+@lru_cache(maxsize=4096)
+def cached_match(region: Polyomino, parts: tuple[Polyomino, ...]) -> bool:
+    stats.count('match.cache_misses')
+    if region.negative:
+        return cached_match(-region, tuple(sorted(-part for part in parts)))
+    if region.rotate:
+        return any(cached_match(Polyomino(cells), parts) for cells in region.orientations())
+    positives = [part for part in parts if not part.negative]
+    negatives = [part for part in parts if part.negative]
+    cells = frozenset(region.cells)
+    if len(cells) + sum(map(len, negatives)) != sum(map(len, positives)):
+        return False
+    pieces = [[frozenset(shape) for shape in part.orientations()] for part in positives]
+    if len(negatives) == 0:
+        return tile(cells, pieces)
+    return any(tile(grown, pieces)
+               for grown in add_negatives(cells, [[frozenset(shape) for shape in part.orientations()]
+                                                  for part in negatives]))
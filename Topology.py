@@ -0,0 +1,42 @@
+from typing import TYPE_CHECKING
+
+from Position import Coordinate, segment_between
+
+if TYPE_CHECKING:
+    from Board import Board
+
+
+class Topology:
+    """
+    The point lattice of a board compiled into flat arrays, CSR style: point (x, y) has index `x * stride + y`,
+    and its neighbours through connected segments, in `Board.nears` order, are
+    `targets[offsets[index]:offsets[index + 1]]`.
+    Never edited once built; `Board.connect` and `Board.disconnect` drop the board's topology instead,
+    so copies of a board can keep sharing the one they got.
+    """
+
+    def __init__(self, board: 'Board'):
+        self.stride: int = board.height + 1
+        self.size: int = (board.width + 1) * self.stride
+        point_type = board.start_point.type
+        self.coordinates: list[Coordinate] = [Coordinate.of(index // self.stride, index % self.stride, point_type)
+                                              for index in range(self.size)]
+        self.offsets: list[int] = [0]
+        self.targets: list[int] = []
+        for point in self.coordinates:
+            self.targets.extend(self.index(near) for near in board.nears(point)
+                                if board.is_connected(segment_between(point, near)))
+            self.offsets.append(len(self.targets))
+        # The same rows as coordinates, which is what the path search walks over
+        self.rows: list[tuple[Coordinate, ...]] = [tuple(self.coordinates[target] for target in self.row(index))
+                                                   for index in range(self.size)]
+
+    def index(self, point: Coordinate) -> int:
+        return point.x * self.stride + point.y
+
+    def row(self, index: int) -> list[int]:
+        return self.targets[self.offsets[index]:self.offsets[index + 1]]
+
+    def nears(self, point: Coordinate) -> tuple[Coordinate, ...]:
+        """The neighbours of a point in the board reachable through a connected segment."""
+        return self.rows[point.x * self.stride + point.y]
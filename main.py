@@ -1,15 +1,86 @@
+import json
+import sys
+from argparse import ArgumentParser, Namespace
+from time import perf_counter
+
 from Board import Board
-from Generator import generate_part
+from Generator import GenerationSession
+from Parallel import solve_stream
 from Path import Path
 from Position import Coordinate
+from Serialization import PuzzleWriter, PuzzleReader
+from Stats import stats
 
 
-def main() -> None:
+def generate(args: Namespace) -> None:
     from pprint import pprint
     board = Board(2, 2, Coordinate(0, 0), Coordinate(2, 2))
     solution = Path([Coordinate(0, 0), Coordinate(0, 1), Coordinate(1, 1), Coordinate(1, 2), Coordinate(2, 2)],
                     Coordinate(2, 2))
-    pprint(list(generate_part(board, solution, 10)))
+    session = GenerationSession(board, solution)
+    if args.output is None:
+        pprint(list(session.take(10)))
+    else:
+        with PuzzleWriter(args.output, args.binary) as writer:
+            for generated in session.take(10):
+                writer.write(generated, session.solution_of(generated))
+
+
+def solve(args: Namespace) -> None:
+    """Solves a puzzle file (or stdin) and writes one JSON line per puzzle, in the order they finish."""
+    results = sys.stdout if args.results == '-' else open(args.results, 'w')
+    start = perf_counter()
+    count = 0
+    with PuzzleReader(sys.stdin.buffer if args.input == '-' else args.input) as reader:
+        for result in solve_stream(reader, args.workers, args.max_pending, args.max_nodes, args.timeout):
+            results.write(json.dumps({
+                'index': result.index,
+                'solutions': len(result.paths),
+                'paths': [[[point.x, point.y] for point in path.points] for path in result.paths],
+                'seconds': result.seconds,
+                'expected': result.expected,
+                'status': str(result.status),
+            }) + '\n')
+            results.flush()
+            count += 1
+    if results is not sys.stdout:
+        results.close()
+    elapsed = perf_counter() - start
+    print(f'Solved {count} puzzles in {elapsed:.2f}s ({count / elapsed if elapsed != 0 else 0:.1f} puzzles/s)',
+          file=sys.stderr)
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument('--stats', choices=['json', 'collapsed'],
+                        help='record solver and generator statistics and print them in this format')
+    parser.add_argument('--stats-file', help='write the statistics here instead of to stdout')
+    parser.add_argument('--output', help='stream the generated puzzles to this file instead of printing them')
+    parser.add_argument('--binary', action='store_true', help='write --output in the packed binary format')
+    commands = parser.add_subparsers(dest='command')
+    solve_parser = commands.add_parser('solve', help='solve every puzzle of a puzzle file')
+    solve_parser.add_argument('input', nargs='?', default='-', help='a puzzle file, or - for stdin (the default)')
+    solve_parser.add_argument('-o', '--results', default='-', help='where to write the results; stdout by default')
+    solve_parser.add_argument('--workers', type=int, help='solver processes; one per CPU by default')
+    solve_parser.add_argument('--max-pending', type=int,
+                              help='puzzles read ahead of their results; twice the workers by default')
+    solve_parser.add_argument('--max-nodes', type=int, help='give up on a puzzle after this many search nodes')
+    solve_parser.add_argument('--timeout', type=float, help='give up on a puzzle after this many seconds')
+    args = parser.parse_args()
+    stats.enabled = args.stats is not None
+
+    if args.command == 'solve':
+        solve(args)
+    else:
+        generate(args)
+
+    if args.stats is not None:
+        output = stats.to_json() if args.stats == 'json' else stats.collapsed()
+        if args.stats_file is None:
+            print(output)
+        else:
+            with open(args.stats_file, 'w') as file:
+                file.write(output + '\n')
 
 
 if __name__ == "__main__":
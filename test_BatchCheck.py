@@ -0,0 +1,17 @@
+from BatchCheck import BatchCheck, iter_paths_batched
+from Path import iter_paths
+from RandomBoards import boards, solved
+
+
+def test_mask_matches_board_check():
+    for board in boards(120, (3, 4, 5)):
+        paths = list(iter_paths(board, prune=False, check=False))
+        mask = BatchCheck(board).check(paths)
+        assert mask.tolist() == [board.check(path) for path in paths]
+
+
+def test_batched_search_finds_the_same_paths():
+    for board in boards(120, (3, 4, 5)):
+        expected = solved(board)
+        for batch in (7, 4096):
+            assert [str(path) for path in iter_paths_batched(board, batch)] == expected
@@ -0,0 +1,26 @@
+from Benchmark import build_case, compare, SIZES
+from Shape import Block
+
+
+def result(seconds: float, calibration: float, value: object = 1) -> dict:
+    return {'seconds': seconds, 'calibration': calibration, 'ratio': seconds / calibration, 'result': value}
+
+
+def test_compare_goes_by_the_ratio_to_the_calibration_run():
+    baseline = {'check': result(1.0, 0.5)}
+    # A machine twice as slow in both is no regression, nor is one a little slower
+    assert compare({'check': result(2.0, 1.0)}, baseline, 0.25) == []
+    assert compare({'check': result(1.2, 0.5)}, baseline, 0.25) == []
+    assert len(compare({'check': result(1.0, 0.3)}, baseline, 0.25)) == 1
+    assert compare({'check': result(1.0, 0.5, 2)}, baseline, 0.25) == ['check: result changed']
+    assert compare({'match': result(9.0, 0.5)}, baseline, 0.25) == []
+
+
+def test_block_cases_have_every_kind_of_piece():
+    for size in SIZES:
+        case = build_case(size, 'block')
+        pieces = [shape.shape for _, shape in case.board.constraints() if isinstance(shape, Block)]
+        assert any(not piece.rotate and not piece.negative for piece in pieces), case.name
+        assert any(piece.rotate and not piece.negative for piece in pieces), case.name
+        assert any(piece.negative for piece in pieces), case.name
+        assert case.board.check(case.solution), case.name
@@ -0,0 +1,11 @@
+from Benchmark import build_case, KINDS
+from RandomBoards import boards, solved
+
+
+def test_bitboard_finds_the_same_paths_in_the_same_order():
+    for board in boards(80, (4,)):
+        for prune in (True, False):
+            assert solved(board, bitboard=True, prune=prune) == solved(board, prune=prune)
+    for kind in KINDS:
+        board = build_case(6, kind).board
+        assert solved(board, bitboard=True) == solved(board)
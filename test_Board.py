@@ -0,0 +1,106 @@
+from dataclasses import FrozenInstanceError
+from random import Random
+
+import pytest
+
+from Board import Board, Segment
+from Generator import get_actions
+from Path import find_paths
+from Position import Coordinate, CoordinateType, SegmentDirection, SegmentPos
+from RandomBoards import random_board, solved
+from Shape import Hexagon, Square, Colors, Jack
+from SolveCache import solve_cache
+
+
+def fresh(board: Board) -> Board:
+    """The same board with none of its caches computed yet."""
+    rebuilt = board.copy()
+    rebuilt._fingerprint = rebuilt._constraints = rebuilt._has_jack = rebuilt._topology = None
+    return rebuilt
+
+
+def test_board_objects_cannot_be_edited_from_outside():
+    board = Board(2, 2, Coordinate(0, 0), Coordinate(2, 2))
+    board.add_grid_shape(0, 0, Square(Colors.Red))
+    segment = board.segment_positions()[0]
+    with pytest.raises(TypeError):
+        board.segments[segment] = Segment(connected=False)
+    with pytest.raises(AttributeError):
+        board.grids[Coordinate.of(0, 0)].shapes.append(Hexagon())
+    with pytest.raises(FrozenInstanceError):
+        board.grids[Coordinate.of(0, 0)].shapes = ()
+    assert board.segments.get(segment, Segment()).with_connected(False).connected is False
+    assert board.is_connected(segment)
+
+
+def test_caches_follow_edits_of_copies():
+    for seed in range(60):
+        rng = Random(seed)
+        board = random_board(seed)
+        before = solved(board)
+        fingerprint, constraints, topology = board.fingerprint(), board.constraints(), board.topology()
+        edited = board.copy()
+        segment = rng.choice(board.segment_positions())
+        if edited.is_connected(segment):
+            edited.disconnect(segment)
+        else:
+            edited.connect(segment)
+        point = rng.choice(board.point_positions())
+        edited.add_point_shape(point.x, point.y, Hexagon())
+        assert edited.fingerprint() == fresh(edited).fingerprint() != fingerprint
+        assert edited.constraints() == fresh(edited).constraints()
+        assert edited.topology().rows == fresh(edited).topology().rows
+        assert solved(edited) == solved(fresh(edited))
+        assert (board.fingerprint(), board.constraints(), board.topology()) == (fingerprint, constraints, topology)
+        assert solved(board) == before
+
+
+def test_coordinate_types_are_cached_apart():
+    # A Jack's candidates are looked up by Grid-typed positions, which only match a segment at an untyped one
+    boards: list[Board] = []
+    for point_type in (CoordinateType.Unknown, CoordinateType.Point):
+        board = Board(2, 2, Coordinate(0, 0), Coordinate(2, 2))
+        board.add_grid_shape(0, 1, Jack())
+        board.add_segment_shape(SegmentPos.of(Coordinate.of(1, 1, point_type), SegmentDirection.X), Hexagon())
+        boards.append(board)
+    assert [len(find_paths(board, cache=None)) for board in boards] == [4, 0]
+    solve_cache.clear()
+    assert [len(find_paths(board)) for board in boards] == [4, 0]
+
+
+def test_reading_stores_no_default_objects():
+    for seed in range(60):
+        board = random_board(seed)
+        stored = (dict(board.points), dict(board.segments), dict(board.grids))
+        paths = find_paths(board, cache=None)
+        for path in paths[:1]:
+            get_actions(board, path, Random(seed))
+        with pytest.raises(KeyError):
+            board.grids[Coordinate.of(board.width, board.height)]
+        assert (dict(board.points), dict(board.segments), dict(board.grids)) == stored
+        assert not any(obj.is_default() for name in ('points', 'segments', 'grids')
+                       for obj in board.container(name).values())
+
+
+def test_path_shapes_fail_before_regions_are_labelled():
+    board = Board(3, 3, Coordinate(0, 0), Coordinate(3, 3))
+    board.add_grid_shape(1, 1, Square(Colors.Red))
+    board.add_grid_shape(1, 2, Square(Colors.Blue))
+    board.add_point_shape(3, 0, Hexagon())
+    paths = find_paths(Board(3, 3, Coordinate(0, 0), Coordinate(3, 3)), cache=None)
+    missing = [path for path in paths if Coordinate.of(3, 0) not in path.point_set]
+    assert len(missing) != 0
+    labelled: list[object] = []
+    board.regions = lambda path: labelled.append(path)
+    assert not any(board.check(path) for path in missing)
+    assert labelled == []
+
+
+def test_grid_shapes_must_be_on_the_board():
+    board = Board(2, 2, Coordinate(0, 0), Coordinate(2, 2))
+    for x, y in [(2, 0), (0, 2), (-1, 1), (2, 2)]:
+        with pytest.raises(ValueError):
+            board.add_grid_shape(x, y, Square(Colors.Red))
+    assert len(board.grids) == 0
+    board.add_grid_shape(1, 1, Square(Colors.Red))
+    assert all(board.check(path) for path in find_paths(Board(2, 2, Coordinate(0, 0), Coordinate(2, 2)), cache=None))
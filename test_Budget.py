@@ -0,0 +1,63 @@
+from itertools import islice
+from threading import Barrier, Thread
+
+from Benchmark import build_case
+from Budget import Budget, SearchStatus, active_budget, within
+from Path import iter_paths, search_paths
+from RandomBoards import random_board
+from Tiling import cached_match
+
+
+def test_node_limit_keeps_a_prefix_of_the_paths():
+    for seed in range(40):
+        board = random_board(seed)
+        everything = [str(path) for path in iter_paths(board)]
+        for nodes in (0, 5, 20):
+            budget = Budget.of(nodes=nodes)
+            result = search_paths(board, budget, cache=None)
+            found = [str(path) for path in result.paths]
+            assert found == everything[:len(found)]
+            assert result.status in (SearchStatus.Complete, SearchStatus.NodeLimit)
+            if result.status is SearchStatus.Complete:
+                assert found == everything
+
+
+def test_deadline_and_cancel():
+    board = build_case(6, 'block').board
+    assert search_paths(board, Budget.of(seconds=0), cache=None).status is SearchStatus.Deadline
+    budget = Budget.of()
+    budget.cancel()
+    result = search_paths(board, budget, cache=None)
+    assert (result.paths, result.status) == ([], SearchStatus.Cancelled)
+
+
+def test_budget_is_only_active_inside_search_steps():
+    case = build_case(5, 'block')
+    budget = Budget.of(nodes=10 ** 6)
+    for _ in islice(iter_paths(case.board, budget=budget), 1):
+        assert active_budget.get() is None
+        budget.status = SearchStatus.Cancelled  # A check outside the search must not raise out of the tiling
+        cached_match.cache_clear()
+        assert case.board.check(case.solution)
+    assert active_budget.get() is None
+
+
+def test_active_budget_is_per_thread():
+    both_inside = Barrier(2)
+    seen: dict[int, bool] = {}
+
+    def search(index: int) -> None:
+        budget = Budget.of()
+
+        def step() -> None:
+            both_inside.wait()
+            seen[index] = active_budget.get() is budget
+
+        within(budget, step)
+
+    threads = [Thread(target=search, args=(index,)) for index in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert seen == {0: True, 1: True}
@@ -0,0 +1,59 @@
+from random import Random
+
+from Board import Board
+from Generator import GenerationSession, get_actions
+from Path import Path, find_paths
+from Position import Coordinate
+from RandomBoards import random_board, solved
+from SolveCache import SolveCache, Solutions
+from Stats import stats
+
+
+def template() -> tuple[Board, Path]:
+    board = Board(2, 2, Coordinate(0, 0), Coordinate(2, 2))
+    solution = Path([Coordinate(0, 0), Coordinate(0, 1), Coordinate(1, 1), Coordinate(1, 2), Coordinate(2, 2)],
+                    Coordinate(2, 2))
+    return board, solution
+
+
+def test_puzzles_come_with_their_only_path():
+    board, solution = template()
+    for seed in range(5):
+        session = GenerationSession(board, solution, Random(seed))
+        for puzzle in session.take(10):
+            assert [str(path) for path in find_paths(puzzle, cache=None)] == [str(session.solution_of(puzzle))]
+
+
+def test_generation_times_its_searches():
+    board, solution = template()
+    stats.clear()
+    stats.enabled = True
+    try:
+        list(GenerationSession(board, solution, Random(0)).take(3))
+    finally:
+        stats.enabled = False
+    stacks = set(stats.stacks)
+    stats.clear()
+    assert {'generate', 'generate;find_paths', 'generate;minimise'} <= stacks
+
+
+def test_narrowing_restricted_children_matches_a_search():
+    narrowed = 0
+    for seed in range(80):
+        board = random_board(seed)
+        paths = find_paths(board, cache=None)
+        if board.has_jack() or len(paths) == 0:
+            continue
+        rng = Random(seed)
+        actions = get_actions(board, paths[0], rng)
+        for action in rng.sample(actions, min(len(actions), 6)):
+            if not action.restricts(board):
+                continue
+            child = board.copy()
+            action.apply_on(child, paths[0], rng)
+            session = GenerationSession(board, paths[0], rng, cache=SolveCache())
+            solutions = session.solve(child, Solutions(paths, complete=True))
+            assert solutions.complete
+            assert [str(path) for path in solutions.paths] == solved(child)
+            narrowed += 1
+    assert narrowed > 50
@@ -0,0 +1,67 @@
+from itertools import islice
+from random import Random
+
+from Benchmark import build_case
+from Board import Board
+from JackCheck import JackCheck
+from Path import Path, iter_paths
+from RandomBoards import random_board
+from Shape import Jack
+
+
+def diff_jack_check(board: Board, path: Path) -> bool:
+    """
+    `Board.check` as it was before `JackCheck`: a board with a Jack passes if, without that Jack, it fails,
+    but passes once one more shape of the Jack's region (or of its points and segments off the path) is gone.
+    Every candidate is a whole board, checked the same way for the Jacks left on it.
+    """
+    jacks = [pos for pos, grid in board.grids.items() if any(isinstance(shape, Jack) for shape in grid.shapes)]
+    if len(jacks) == 0:
+        return board.check(path)
+    jack_pos = jacks[0]
+    shapes = list(board.grids[jack_pos].shapes)
+    shapes.remove(next(shape for shape in shapes if isinstance(shape, Jack)))
+    no_jack = board.with_grid(jack_pos, board.grids[jack_pos].with_shapes(tuple(shapes)))
+    if diff_jack_check(no_jack, path):
+        return False
+    part = board.find_including_part(jack_pos, path)
+    candidates = ([no_jack.with_grid(grid, changed) for grid in part.grids if grid != jack_pos
+                   if (obj := board.grids.get(grid)) is not None for changed in obj.without_one_shape()]
+                  + [no_jack.with_segment(segment, changed) for segment in part.segments
+                     if segment not in path.segments
+                     if (obj := board.segments.get(segment)) is not None for changed in obj.without_one_shape()]
+                  + [no_jack.with_point(point, changed) for point in part.points
+                     if point not in path.points
+                     if (obj := board.points.get(point)) is not None for changed in obj.without_one_shape()])
+    return any(diff_jack_check(candidate, path) for candidate in candidates)
+
+
+def boards_with_jacks() -> list[Board]:
+    boards = [build_case(size, 'jack').board for size in (2, 3, 4)]
+    for seed in range(400):
+        board = random_board(seed)
+        if not board.has_jack():
+            continue
+        boards.append(board)
+        rng = Random(seed)
+        empty = [grid for grid in board.grid_positions() if grid not in board.grids]
+        if len(boards) % 3 == 0 and len(empty) != 0:
+            second = board.copy()
+            grid = rng.choice(empty)
+            second.add_grid_shape(grid.x, grid.y, Jack())
+            boards.append(second)
+    return boards
+
+
+def test_jack_check_agrees_with_diff_jack():
+    boards = boards_with_jacks()
+    assert len(boards) > 100
+    checked = passed = 0
+    for board in boards:
+        for path in islice(iter_paths(board, prune=False, check=False), 200):
+            expected = diff_jack_check(board, path)
+            assert JackCheck(board, path, board.regions(path)).valid() == expected, (board, str(path))
+            assert board.check(path) == expected
+            checked += 1
+            passed += expected
+    assert 0 < passed < checked
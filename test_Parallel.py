@@ -0,0 +1,39 @@
+from random import Random
+
+from Benchmark import build_case, KINDS, random_path
+from Board import Board
+from Generator import generate_part
+from Parallel import find_paths_parallel, generate_parallel, solve_stream
+from Path import find_paths
+from Position import Coordinate
+from RandomBoards import boards, solved
+from Serialization import Puzzle
+
+
+def test_parallel_search_finds_the_same_paths_in_the_same_order():
+    for kind in KINDS:
+        board = build_case(5, kind).board
+        expected = solved(board)
+        # A small chunk, so that unfinished prefixes are handed back to the pool
+        found = find_paths_parallel(board, 2, prefixes_per_worker=2, chunk=20)
+        assert [str(path) for path in found] == expected
+
+
+def test_parallel_generation_matches_generate_part():
+    board = Board(3, 3, Coordinate(0, 0), Coordinate(3, 3))
+    solution = random_path(board, Random(0))
+    expected = [generated.fingerprint() for generated in generate_part(board, solution, 4, seed=1)]
+    assert len(expected) != 0
+    generated = sorted(generate_parallel(board, solution, 4, seed=1, workers=2), key=lambda result: result[0])
+    assert [puzzle.fingerprint() for _, puzzle in generated] == expected
+
+
+def test_solve_stream_solves_every_puzzle():
+    random_boards = boards(30)
+    puzzles = [Puzzle(board, paths[0] if len(paths := find_paths(board, cache=None)) != 0 else None)
+               for board in random_boards]
+    results = sorted(solve_stream(puzzles, workers=2, max_pending=3), key=lambda result: result.index)
+    assert [result.index for result in results] == list(range(len(random_boards)))
+    for board, puzzle, result in zip(random_boards, puzzles, results):
+        assert [str(path) for path in result.paths] == solved(board)
+        assert result.expected == (None if puzzle.solution is None else True)
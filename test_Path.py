@@ -0,0 +1,23 @@
+from Path import find_paths, count_paths
+from RandomBoards import boards, random_board, solved
+from SolveCache import SolveCache
+
+
+def test_pruning_keeps_every_path():
+    for board in boards(150, (4, 5, 6)):
+        assert solved(board) == solved(board, prune=False)
+
+
+def test_count_paths_agrees_with_find_paths():
+    for seed in range(80):
+        board = random_board(seed)
+        solved_cache = SolveCache()
+        count = len(find_paths(board, cache=solved_cache))
+        for limit in (0, 1, 2, 3):
+            assert count_paths(board, limit, cache=None) == min(count, limit)
+        # A full search answers any limit from the cache, and a count that stopped early is searched again
+        assert count_paths(board, 5, cache=solved_cache) == min(count, 5)
+        assert solved_cache.hits == 1
+        cache = SolveCache()
+        assert count_paths(board, 1, cache=cache) == min(count, 1)
+        assert count_paths(board, 3, cache=cache) == min(count, 3)
@@ -0,0 +1,36 @@
+from io import BytesIO
+from itertools import islice
+
+from Board import Board
+from Path import Path, iter_paths
+from RandomBoards import boards, solved
+from Serialization import Puzzle, PuzzleWriter, PuzzleReader
+
+
+def encode(puzzles: list[tuple[Board, Path | None]], binary: bool) -> bytes:
+    file = BytesIO()
+    with PuzzleWriter(file, binary) as writer:
+        for board, solution in puzzles:
+            writer.write(board, solution)
+    return file.getvalue()
+
+
+def decode(data: bytes) -> list[Puzzle]:
+    with PuzzleReader(BytesIO(data)) as reader:
+        return list(reader)
+
+
+def test_round_trip_keeps_boards_and_solutions():
+    # Any path over connected segments stands in for a solution; every other board has none
+    puzzles = [(board, next(islice(iter_paths(board, prune=False, check=False), 1), None) if seed % 2 == 0 else None)
+               for seed, board in enumerate(boards(200))]
+    for binary in (False, True):
+        data = encode(puzzles, binary)
+        decoded = decode(data)
+        assert len(decoded) == len(puzzles)
+        for (board, solution), puzzle in zip(puzzles, decoded):
+            assert puzzle.board.fingerprint() == board.fingerprint()
+            assert str(puzzle.solution) == str(solution)
+        assert encode([(puzzle.board, puzzle.solution) for puzzle in decoded], binary) == data
+    board = next(board for board, _ in puzzles if len(board.grids) != 0)
+    assert solved(decode(encode([(board, None)], binary=True))[0].board) == solved(board)
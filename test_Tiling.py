@@ -0,0 +1,91 @@
+from itertools import product
+from random import Random
+
+from Position import BoardPart, Coordinate
+from Tiling import cached_match
+
+type Cells = frozenset[tuple[int, int]]
+type Part = tuple[Cells, bool, bool]  # Cells, rotate, negative
+
+
+def rotations(cells: Cells, rotate: bool) -> list[Cells]:
+    found = [cells]
+    for _ in range(3 if rotate else 0):
+        found.append(frozenset((y, -x) for x, y in found[-1]))
+    return found
+
+
+def near(first: Cells, second: Cells) -> bool:
+    return any(abs(x1 - x2) + abs(y1 - y2) == 1 for x1, y1 in first for x2, y2 in second)
+
+
+def combine(first: Cells, first_rotate: bool, second: Cells, second_rotate: bool) -> list[Cells]:
+    """`BoardPart.__and__` before dancing links: the unions of `first` with `second` moved next to it."""
+    if first_rotate:
+        return [union for rotated in rotations(first, True) for union in combine(rotated, False, second, second_rotate)]
+    if second_rotate:
+        return combine(second, True, first, False)
+    return [first | moved for dx, dy in {(x1 - x2 + sx, y1 - y2 + sy) for x1, y1 in first for x2, y2 in second
+                                         for sx, sy in ((1, 0), (-1, 0), (0, 1), (0, -1))}
+            if near(first, moved := frozenset((x + dx, y + dy) for x, y in second)) and not first & moved]
+
+
+def reference_match(region: Cells, rotate: bool, negative: bool, parts: list[Part]) -> bool:
+    """`BoardPart.match` before dancing links: a recursive search placing the parts one by one."""
+    if negative:
+        return reference_match(region, rotate, False, [(cells, turn, not flip) for cells, turn, flip in parts])
+    negatives = [part for part in parts if part[2]]
+    if len(negatives) != 0:
+        return any(reference_match(added, False, False, [part for part in parts if part is not neg])
+                   for neg in negatives for added in combine(neg[0], neg[1], region, rotate))
+    if rotate or any(turn for _, turn, _ in parts):
+        return any(reference_match(rotated, False, False, [(cells, False, False) for cells in rotated_parts])
+                   for rotated in rotations(region, rotate)
+                   for rotated_parts in product(*[rotations(cells, turn) for cells, turn, _ in parts]))
+    if len(region) == len(parts) == 0:
+        return True
+    if len(region) != sum(len(cells) for cells, _, _ in parts):
+        return False
+    first = parts[0][0]
+    return any(reference_match(region - moved, False, False, parts[1:])
+               for dx, dy in {(x1 - x2, y1 - y2) for x1, y1 in region for x2, y2 in first}
+               if (moved := frozenset((x + dx, y + dy) for x, y in first)) <= region)
+
+
+def random_cells(rng: Random, size: int) -> Cells:
+    cells = {(0, 0)}
+    while len(cells) < size:
+        x, y = rng.choice(sorted(cells))
+        dx, dy = rng.choice(((1, 0), (-1, 0), (0, 1), (0, -1)))
+        cells.add((x + dx, y + dy))
+    return frozenset(cells)
+
+
+def random_case(rng: Random) -> tuple[Cells, list[Part]]:
+    """A region and pieces of the same total area, so that the tiling is sometimes possible and sometimes not."""
+    region = random_cells(rng, rng.randint(1, 6))
+    sizes: list[int] = []
+    while sum(sizes) < len(region):
+        sizes.append(rng.randint(1, len(region) - sum(sizes)))
+    parts = [(random_cells(rng, size), rng.random() < 0.5, False) for size in sizes]
+    if rng.random() < 0.25:
+        size = rng.randint(1, 2)
+        parts += [(random_cells(rng, size), rng.random() < 0.5, True),
+                  (random_cells(rng, size), rng.random() < 0.5, False)]
+    return region, parts
+
+
+def board_part(cells: Cells, rotate: bool = False, negative: bool = False) -> BoardPart:
+    return BoardPart({Coordinate.of(x, y) for x, y in cells}, rotate=rotate, negative=negative)
+
+
+def test_match_agrees_with_the_recursive_matcher():
+    rng = Random(5)
+    results = set()
+    for _ in range(1000):
+        region, parts = random_case(rng)
+        expected = reference_match(region, False, False, parts)
+        assert board_part(region).match([board_part(*part) for part in parts]) == expected, (region, parts)
+        results.add(expected)
+    assert results == {True, False}
+    cached_match.cache_clear()